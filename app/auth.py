@@ -1,54 +1,63 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from .cache import TTLCache
 from .config import settings
-from .database import SessionLocal
+from .database import SessionLocal, get_async_sessionmaker, session_for
 from .models import User
+from . import passwords
 from sqlalchemy import select, or_, func
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # для эндпоинтов где токен обязателен (например /users/me)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 # для эндпоинтов где токен может быть (например /feed/public)
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    # GET/HEAD — на реплику (если задан READ_REPLICA_URL), остальное — на primary
+    db = session_for(request)
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return passwords.verify_sync(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return passwords.hash_sync(password)
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(subject: str, expires_delta: Optional[timedelta] = None, user_id: Optional[int] = None) -> str:
     expire = datetime.now(tz=timezone.utc) + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode = {"sub": subject, "exp": expire}
+    if user_id is not None and settings.TOKEN_INCLUDE_USER_ID:
+        to_encode["uid"] = user_id
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.scalars(select(User).where(User.username == username)).first()
 
-def get_user_by_login(db: Session, login: str) -> Optional[User]:
+def _user_by_login_stmt(login: str):
     login = login.strip()
-    return db.scalars(
-        select(User).where(
-            or_(
-                User.username == login,
-                func.lower(User.email) == login.lower()
-            )
+    return select(User).where(
+        or_(
+            User.username == login,
+            func.lower(User.email) == login.lower()
         )
-    ).first()
+    )
+
+def get_user_by_login(db: Session, login: str) -> Optional[User]:
+    return db.scalars(_user_by_login_stmt(login)).first()
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     user = get_user_by_login(db, username)
@@ -58,20 +67,87 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
         return None
     return user
 
+# async-вариант для /auth/login: запрос через AsyncSession, bcrypt — в passwords executor
+async def authenticate_user_async(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    user = (await db.scalars(_user_by_login_stmt(username))).first()
+    if not user:
+        return None
+    if not await passwords.verify_password(password, user.hashed_password):
+        return None
+    return user
+
+# token -> (uid | None, username, exp | None); user id -> отсоединённый (expunged) User.
+# Строки пользователей сбрасываются при изменении User через ORM (см. события ниже)
+# или явным invalidate_user() после bulk-UPDATE.
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+def invalidate_user(user_id: int) -> None:
+    _user_cache.pop(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
+def _token_ttl(exp: Optional[float]) -> float:
+    # не держим в кэше дольше, чем живёт сам токен
+    if exp is None:
+        return settings.AUTH_CACHE_TTL
+    return min(settings.AUTH_CACHE_TTL, exp - datetime.now(tz=timezone.utc).timestamp())
+
+def _decode_claims(token: str) -> Optional[tuple[Optional[int], str, Optional[float]]]:
+    claims = _token_cache.get(token)
+    if claims is not None:
+        return claims
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if not username:
+        return None
+    claims = (payload.get("uid"), username, payload.get("exp"))
+    _token_cache.set(token, claims, ttl=_token_ttl(claims[2]))
+    return claims
+
+def _decode_token(token: str) -> Optional[tuple[Optional[int], str]]:
+    claims = _decode_claims(token)
+    return None if claims is None else claims[:2]
+
+def _resolve_user(db: Session, token: str) -> Optional[User]:
+    claims = _decode_claims(token)
+    if claims is None:
+        return None
+    user_id, username, exp = claims
+    if user_id is not None:
+        user = _user_cache.get(user_id)
+        if user is not None:
+            return user if user.username == username else None
+        user = db.get(User, user_id)
+    else:
+        user = get_user_by_username(db, username)
+        if user is not None:
+            # старый токен без uid: дальше по этому токену ищем по первичному ключу
+            _token_cache.set(token, (user.id, username, exp), ttl=_token_ttl(exp))
+    if user is None or user.username != username:
+        return None
+    db.expunge(user)
+    _user_cache.set(user.id, user)
+    return user
+
+def resolve_token(token: str) -> Optional[User]:
+    # для долгих соединений (SSE, WebSocket): короткая своя сессия, а не сессия на весь запрос
+    with SessionLocal() as db:
+        return _resolve_user(db, token)
+
 def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = get_user_by_username(db, username)
+    user = _resolve_user(db, token)
     if user is None:
         raise credentials_exception
     return user
@@ -82,11 +158,4 @@ def get_current_user_optional(
 ) -> Optional[User]:
     if not token:
         return None
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        if not username:
-            return None
-    except JWTError:
-        return None
-    return get_user_by_username(db, username)
+    return _resolve_user(db, token)
@@ -0,0 +1,131 @@
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from .config import settings
+
+# gzip/brotli по Accept-Encoding. Ответы меньше COMPRESSION_MIN_SIZE уходят как есть,
+# потоковые (NDJSON) сжимаются по кускам с flush, чтобы клиент получал каждую
+# пачку сразу. brotli — опциональная зависимость: без пакета остаётся только gzip.
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+CODINGS = ("gzip", "br")
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    # у сжатого представления другие байты — и свой валидатор: "<etag>-gzip"
+    return etag[:-1] + f'-{coding}"' if etag.endswith('"') else etag
+
+
+def identity_etag(etag: str) -> str:
+    # обратное encoded_etag: If-None-Match сравнивается с ETag несжатого тела
+    for coding in CODINGS:
+        if etag.endswith(f'-{coding}"'):
+            return etag[:-len(coding) - 2] + '"'
+    return etag
+
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self):
+        self._z = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self):
+        self._c = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        out = self._c.process(data)
+        return out + (self._c.finish() if final else self._c.flush())
+
+
+def negotiate(accept_encoding: str):
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return _Brotli
+    if accepted.get("gzip", 0) > 0:
+        return _Gzip
+    return None
+
+
+class _Responder:
+    def __init__(self, send, compressor_cls):
+        self.send = send
+        self.compressor_cls = compressor_cls
+        self.compressor = None
+        self.start = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            return await self.send(message)
+        if self.passthrough:
+            return await self.send(message)
+        if self.compressor is not None:
+            more = message.get("more_body", False)
+            body = self.compressor.compress(message.get("body", b""), final=not more)
+            return await self.send({"type": "http.response.body", "body": body, "more_body": more})
+
+        # первый кусок тела: решаем, сжимать ли
+        headers = MutableHeaders(raw=list(self.start.get("headers", [])))
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        compressible = (
+            self.start["status"] not in (204, 304)
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if not compressible or (not more and len(body) < settings.COMPRESSION_MIN_SIZE):
+            self.passthrough = True
+            await self.send({**self.start, "headers": headers.raw})
+            return await self.send(message)
+
+        self.compressor = self.compressor_cls()
+        body = self.compressor.compress(body, final=not more)
+        headers["Content-Encoding"] = self.compressor.name
+        if "etag" in headers:
+            headers["ETag"] = encoded_etag(headers["etag"], self.compressor.name)
+        if more:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(body))
+        await self.send({**self.start, "headers": headers.raw})
+        await self.send({"type": "http.response.body", "body": body, "more_body": more})
+
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            return await self.app(scope, receive, send)
+        compressor_cls = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if compressor_cls is None:
+            return await self.app(scope, receive, send)
+        await self.app(scope, receive, _Responder(send, compressor_cls))
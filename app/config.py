@@ -4,7 +4,130 @@ from pydantic import Field
 class Settings(BaseSettings):
     SECRET_KEY: str = Field(default="dev_secret_change_me")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=60)
+    # uid в JWT — get_current_user ищет пользователя по первичному ключу
+    TOKEN_INCLUDE_USER_ID: bool = Field(default=True)
+    # кэш разобранных токенов и строк User в памяти процесса (0 — выключить)
+    AUTH_CACHE_SIZE: int = Field(default=10000)
+    AUTH_CACHE_TTL: int = Field(default=60)
     DATABASE_URL: str = Field(default="sqlite:///./app.db")
+    # пул соединений; pre-ping — лишний round-trip на каждый checkout,
+    # при небольшом DB_POOL_RECYCLE его можно выключить
+    DB_POOL_SIZE: int = Field(default=5)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+    DB_POOL_TIMEOUT: int = Field(default=30)
+    DB_POOL_RECYCLE: int = Field(default=1800)
+    DB_POOL_PRE_PING: bool = Field(default=True)
+    # кэш скомпилированных SQL-выражений SQLAlchemy
+    DB_QUERY_CACHE_SIZE: int = Field(default=1200)
+    # psycopg3: prepared statement после N выполнений одного запроса (0 — сразу)
+    PG_PREPARE_THRESHOLD: int = Field(default=5)
+    SQLITE_WAL: bool = Field(default=True)
+    SQLITE_BUSY_TIMEOUT_MS: int = Field(default=5000)
+    # реплика для GET/HEAD-запросов; запись всегда идёт в DATABASE_URL
+    READ_REPLICA_URL: str | None = Field(default=None)
+    # накатывать миграции при старте; при False — python -m app.migrations перед деплоем
+    MIGRATE_ON_STARTUP: bool = Field(default=True)
+    # прогреть ручки в startup воркера (с gunicorn.conf.py и preload — один раз в мастере)
+    WARMUP_ON_STARTUP: bool = Field(default=False)
+    WARMUP_PATHS: str = Field(default="/health,/feed/public?limit=1,/posts?limit=1,/search?q=warmup&limit=1")
+    # async-движок для /auth; по умолчанию выводится из DATABASE_URL (aiosqlite / psycopg async)
+    ASYNC_DATABASE_URL: str | None = Field(default=None)
+
+    # bcrypt в отдельном executor: thread | process
+    PASSWORD_HASH_EXECUTOR: str = Field(default="thread")
+    PASSWORD_HASH_WORKERS: int = Field(default=2)
+    PASSWORD_HASH_MAX_PENDING: int = Field(default=64)
+
+    # fan-out-on-write домашней ленты
+    TIMELINE_MAX_LENGTH: int = Field(default=800)
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = Field(default=10000)
+    TIMELINE_TRIM_EVERY: int = Field(default=50)
+
+    REDIS_URL: str | None = Field(default=None)
+
+    # кэш ответов для анонимных GET: memory | redis | off
+    RESPONSE_CACHE_BACKEND: str = Field(default="memory")
+    RESPONSE_CACHE_TTL: int = Field(default=30)
+    RESPONSE_CACHE_SIZE: int = Field(default=2048)
+
+    # write-behind для likes_count / reposts_count
+    COUNTER_BUFFER_ENABLED: bool = Field(default=False)
+    COUNTER_FLUSH_INTERVAL: float = Field(default=1.0)
+
+    # фоновые задачи после записи поста (теги, тренды, поисковый индекс, fan-out);
+    # false — выполняются сразу в транзакции запроса
+    JOBS_ENABLED: bool = Field(default=False)
+    # потоков-воркеров в каждом процессе приложения (0 — только python -m app.jobs worker)
+    JOBS_WORKERS: int = Field(default=2)
+    JOBS_POLL_INTERVAL: float = Field(default=1.0)
+    JOBS_MAX_ATTEMPTS: int = Field(default=5)
+    JOBS_RETRY_BASE_SECONDS: float = Field(default=2.0)
+    JOBS_LEASE_SECONDS: int = Field(default=60)
+
+    # граф подписок в памяти (is_following, «кого почитать»): полная перестройка раз в N секунд
+    FOLLOW_GRAPH_REFRESH_SECONDS: int = Field(default=300)
+    # сколько подписок пользователя просматривается при подборе друзей друзей
+    FOLLOW_GRAPH_MAX_NEIGHBORS: int = Field(default=500)
+    FOLLOW_SUGGESTIONS_MAX: int = Field(default=50)
+    FOLLOW_SUGGESTIONS_TTL: int = Field(default=60)
+
+    # трендовые хэштеги
+    TRENDING_BUCKET_SECONDS: int = Field(default=3600)
+    TRENDING_HORIZON_HOURS: int = Field(default=168)
+    TRENDING_HALF_LIFE_HOURS: float = Field(default=6.0)
+    TRENDING_REFRESH_SECONDS: int = Field(default=60)
+    TRENDING_TOP_K: int = Field(default=100)
+
+    # postings хэштегов для поиска по #тегам: тегов в кэше, TTL, свежих постов на тег.
+    # Кэш у каждого воркера свой: без REALTIME_BACKEND=redis другие воркеры видят новые и
+    # удалённые посты тега с опозданием до POSTINGS_CACHE_TTL секунд
+    POSTINGS_CACHE_SIZE: int = Field(default=512)
+    POSTINGS_CACHE_TTL: int = Field(default=10)
+    POSTINGS_MAX_LENGTH: int = Field(default=10000)
+
+    # realtime (SSE / WebSocket): memory — в пределах процесса, redis — между воркерами
+    REALTIME_BACKEND: str = Field(default="memory")
+    REALTIME_QUEUE_SIZE: int = Field(default=100)
+    REALTIME_MAX_CONNECTIONS: int = Field(default=1000)
+    REALTIME_HEARTBEAT_SECONDS: int = Field(default=15)
+
+    # rate limiting (token bucket): "N/second|minute|hour|day", пустая строка — без лимита.
+    # IP берётся из request.client — за прокси настройте uvicorn --forwarded-allow-ips
+    # или включите RATE_LIMIT_TRUST_FORWARDED
+    RATE_LIMIT_ENABLED: bool = Field(default=True)
+    RATE_LIMIT_BACKEND: str = Field(default="memory")
+    RATE_LIMIT_MAX_KEYS: int = Field(default=100000)
+    RATE_LIMIT_TRUST_FORWARDED: bool = Field(default=False)
+    RATE_LIMIT_GLOBAL: str = Field(default="")
+    RATE_LIMIT_LOGIN: str = Field(default="20/minute")
+    RATE_LIMIT_LOGIN_ACCOUNT: str = Field(default="10/minute")
+    RATE_LIMIT_SIGNUP: str = Field(default="20/hour")
+    RATE_LIMIT_SEARCH: str = Field(default="120/minute")
+    RATE_LIMIT_LIKE: str = Field(default="300/minute")
+    # одновременных запросов поиска на воркер (0 — без ограничения)
+    SEARCH_MAX_CONCURRENT: int = Field(default=16)
+
+    # ленты без Pydantic: строки -> dict -> orjson (формат FeedResponse тот же)
+    FAST_JSON_ENABLED: bool = Field(default=False)
+    # NDJSON-поток (Accept: application/x-ndjson): постов в одной пачке
+    STREAM_BATCH_SIZE: int = Field(default=20)
+
+    # сжатие ответов по Accept-Encoding (br — если установлен пакет brotli)
+    COMPRESSION_ENABLED: bool = Field(default=True)
+    COMPRESSION_MIN_SIZE: int = Field(default=1024)
+    COMPRESSION_GZIP_LEVEL: int = Field(default=6)
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=4)
+
+    # полнотекстовый поиск: auto (FTS5 / tsvector по диалекту) или like
+    SEARCH_BACKEND: str = Field(default="auto")
+    SEARCH_TS_CONFIG: str = Field(default="simple")
+
+    # инструментирование запросов: Server-Timing, /metrics, лог медленных запросов
+    SERVER_TIMING_ENABLED: bool = Field(default=True)
+    METRICS_ENABLED: bool = Field(default=True)
+    SLOW_REQUEST_MS: int = Field(default=500)
+    # доля медленных запросов, попадающих в лог (0 — лог выключен)
+    SLOW_REQUEST_SAMPLE_RATE: float = Field(default=0.0)
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,145 @@
+import logging
+import threading
+from collections import defaultdict
+from sqlalchemy import select, update, func, case, bindparam, event
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import SessionLocal
+from .models import User, Post, Follow, Like
+from . import response_cache
+
+log = logging.getLogger(__name__)
+
+# Денормализованные счётчики User.followers_count / following_count / posts_count
+# обновляются в той же транзакции, что и follow/unfollow и создание/удаление постов.
+# Post.likes_count / reposts_count — атомарным UPDATE col = col + n, а при
+# COUNTER_BUFFER_ENABLED дельты копятся в памяти и сбрасываются пачкой раз в
+# COUNTER_FLUSH_INTERVAL секунд, чтобы лайки вирусного поста не стояли в очереди
+# на блокировку одной строки.
+
+
+def bump_user(db: Session, user_id: int, **deltas: int) -> None:
+    values = {name: getattr(User, name) + delta for name, delta in deltas.items()}
+    db.execute(update(User).where(User.id == user_id).values(values))
+
+
+def _non_negative(expr):
+    return case((expr < 0, 0), else_=expr)
+
+
+class CounterBuffer:
+    def __init__(self):
+        self._deltas: dict[tuple[str, int], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, column: str, post_id: int, delta: int) -> None:
+        with self._lock:
+            self._deltas[(column, post_id)] += delta
+
+    def flush(self) -> int:
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+        by_column: dict[str, list[dict]] = defaultdict(list)
+        for (column, post_id), delta in deltas.items():
+            if delta:
+                by_column[column].append({"b_id": post_id, "b_delta": delta})
+        if not by_column:
+            return 0
+        try:
+            with SessionLocal() as db:
+                for column, params in by_column.items():
+                    col = getattr(Post.__table__.c, column)
+                    stmt = (
+                        Post.__table__.update()
+                        .where(Post.__table__.c.id == bindparam("b_id"))
+                        .values({column: _non_negative(col + bindparam("b_delta"))})
+                    )
+                    db.execute(stmt, params)
+                db.commit()
+        except Exception:
+            # вернуть дельты, чтобы не потерять их до следующей попытки
+            log.exception("counter flush failed")
+            for (column, post_id), delta in deltas.items():
+                self.add(column, post_id, delta)
+            return 0
+        post_ids = {p["b_id"] for params in by_column.values() for p in params}
+        response_cache.invalidate("feed", *(f"post:{i}" for i in post_ids))
+        return len(post_ids)
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def start(self, interval: float) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), name="counter-flush", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+counter_buffer = CounterBuffer()
+
+
+# -> False, если поста нет. В буферизованном режиме дельта попадает в буфер
+# только после успешного commit сессии (см. _apply_pending_deltas).
+def bump_post(db: Session, post_id: int, column: str, delta: int) -> bool:
+    if settings.COUNTER_BUFFER_ENABLED:
+        if db.scalar(select(Post.id).where(Post.id == post_id)) is None:
+            return False
+        db.info.setdefault("counter_deltas", []).append((column, post_id, delta))
+        return True
+    col = getattr(Post, column)
+    result = db.execute(
+        update(Post).where(Post.id == post_id).values({column: _non_negative(col + delta)}),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount > 0
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_deltas(db: Session) -> None:
+    for column, post_id, delta in db.info.pop("counter_deltas", ()):
+        counter_buffer.add(column, post_id, delta)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_deltas(db: Session, previous_transaction) -> None:
+    db.info.pop("counter_deltas", None)
+
+
+def recount_user_counters(db: Session) -> None:
+    db.execute(update(User).values(
+        followers_count=select(func.count()).select_from(Follow).where(Follow.following_id == User.id).scalar_subquery(),
+        following_count=select(func.count()).select_from(Follow).where(Follow.follower_id == User.id).scalar_subquery(),
+        posts_count=select(func.count()).select_from(Post).where(Post.author_id == User.id).scalar_subquery(),
+    ), execution_options={"synchronize_session": False})
+
+
+def recount_post_counters(db: Session) -> None:
+    reposts = Post.__table__.alias("reposts")
+    db.execute(update(Post).values(
+        likes_count=select(func.count()).select_from(Like).where(Like.post_id == Post.id).scalar_subquery(),
+        reposts_count=select(func.count()).select_from(reposts).where(reposts.c.original_post_id == Post.id).scalar_subquery(),
+    ), execution_options={"synchronize_session": False})
+
+
+def recount_all(db: Session) -> None:
+    recount_user_counters(db)
+    recount_post_counters(db)
+    db.commit()
+
+
+if __name__ == "__main__":
+    # python -m app.counters — пересчитать все счётчики с нуля
+    with SessionLocal() as db:
+        recount_all(db)
+    print("counters recomputed")
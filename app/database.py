@@ -1,11 +1,111 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from .config import settings
+from .instrumentation import TimedQueuePool, instrument_engine
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
-    pool_pre_ping=True,
-)
+READ_METHODS = ("GET", "HEAD")
+
+
+def _engine_kwargs(url: str) -> dict:
+    u = make_url(url)
+    kwargs = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "query_cache_size": settings.DB_QUERY_CACHE_SIZE}
+    connect_args = {}
+    if u.get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+    if u.get_backend_name() == "postgresql" and u.get_driver_name() == "psycopg":
+        # psycopg3 готовит серверный prepared statement после N выполнений одного запроса
+        connect_args["prepare_threshold"] = settings.PG_PREPARE_THRESHOLD
+    if connect_args:
+        kwargs["connect_args"] = connect_args
+
+    poolclass = u.get_dialect().get_pool_class(u)
+    # размеры пула имеют смысл только для QueuePool (у :memory: SQLite — свой пул на поток)
+    if issubclass(poolclass, QueuePool):
+        kwargs.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+        if poolclass is QueuePool:
+            kwargs["poolclass"] = TimedQueuePool
+    return kwargs
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        # для :memory: SQLite просто вернёт "memory"
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+
+def _setup_engine(engine) -> None:
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+    instrument_engine(engine)
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
+_setup_engine(engine)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+# реплика для чтения: GET/HEAD-запросы идут на неё, всё остальное — на primary.
+# Без READ_REPLICA_URL это тот же движок.
+if settings.READ_REPLICA_URL:
+    replica_engine = create_engine(settings.READ_REPLICA_URL, **_engine_kwargs(settings.READ_REPLICA_URL))
+    _setup_engine(replica_engine)
+    ReadSessionLocal = sessionmaker(bind=replica_engine, autoflush=False, autocommit=False)
+else:
+    replica_engine = engine
+    ReadSessionLocal = SessionLocal
+
+
+def session_for(request: Request | None):
+    if request is not None and request.method in READ_METHODS:
+        return ReadSessionLocal()
+    return SessionLocal()
+
+
+def async_database_url(url: str) -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+psycopg:" + url.split(":", 1)[1]
+    return url
+
+
+# async-движок создаётся лениво: драйвер (aiosqlite/psycopg) импортируется только при первом запросе
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker | None = None
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        url = async_database_url(settings.DATABASE_URL)
+        _async_engine = create_async_engine(url, **_engine_kwargs(url))
+        _setup_engine(_async_engine.sync_engine)
+        _async_sessionmaker = async_sessionmaker(bind=_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = _async_sessionmaker = None
+
+
+def dialect_insert(db):
+    # insert() с on_conflict_do_nothing/on_conflict_do_update для текущей БД (SQLite или PostgreSQL)
+    return sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
@@ -0,0 +1,298 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import Integer, DateTime, Boolean, select, text
+from sqlalchemy.orm import Session
+from .database import engine, SessionLocal
+from .models import User, Post, Follow, Like, Hashtag, PostHashtag
+from .passwords import hash_sync
+from .utils import extract_hashtags
+from .counters import recount_all
+from .hashtags import resolve_hashtag_ids
+from .search_index import get_backend as get_search_backend
+from . import timeline, trending, migrations
+
+# Массовый импорт/экспорт: users, posts, follows, likes, hashtags (post_id, tag)
+# в JSONL или CSV, по файлу на таблицу. Всё идёт потоком пачками по --batch-size:
+# чтение файла -> преобразование -> INSERT executemany (на PostgreSQL+psycopg — COPY),
+# в памяти держится одна пачка. Пароли не перехэшируются: переносится hashed_password,
+# строкам без него ставится хэш --default-password (считается один раз).
+# Хэштеги постов либо читаются из hashtags-файла, либо извлекаются из текста
+# extract_hashtags в пуле процессов. В конце пересчитываются счётчики, ленты,
+# тренды и поисковый индекс.
+#
+#   python -m app.dataio export dump/ --format jsonl
+#   python -m app.dataio import dump/ --format jsonl --workers 4
+
+TABLES = {
+    "users": (User.__table__, ["id", "username", "email", "display_name", "bio", "hashed_password", "created_at"]),
+    "posts": (Post.__table__, ["id", "author_id", "text", "created_at", "updated_at", "edited", "original_post_id"]),
+    "follows": (Follow.__table__, ["follower_id", "following_id", "created_at"]),
+    "likes": (Like.__table__, ["user_id", "post_id", "created_at"]),
+}
+# порядок важен: внешние ключи
+ORDER = ["users", "posts", "follows", "likes", "hashtags"]
+
+
+# --- форматы ---
+
+def _path(directory: str, name: str, fmt: str) -> str:
+    return os.path.join(directory, f"{name}.{fmt}")
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def write_rows(path: str, fmt: str, columns: list[str], rows) -> int:
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(["" if v is None else _encode(v) for v in row])
+                n += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, map(_encode, row))), ensure_ascii=False) + "\n")
+                n += 1
+    return n
+
+
+def read_rows(path: str, fmt: str):
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _converter(column):
+    # CSV отдаёт всё строками, JSONL — datetime строками; приводим к типу колонки
+    if isinstance(column.type, DateTime):
+        return lambda v: datetime.fromisoformat(v) if isinstance(v, str) else v
+    if isinstance(column.type, Boolean):
+        return lambda v: v.strip().lower() in ("1", "true", "t", "yes") if isinstance(v, str) else bool(v)
+    if isinstance(column.type, Integer):
+        return int
+    return lambda v: v
+
+
+def _default(column):
+    # Python-default колонки (default=0, default=datetime.utcnow): COPY и явный None его обходят
+    if column.default is None:
+        return None
+    return column.default.arg if column.default.is_scalar else column.default.arg(None)
+
+
+def _insert_columns(table, columns: list[str]) -> list[str]:
+    # + колонки, которых нет в файле, но они NOT NULL с Python-default (счётчики)
+    return columns + [c.name for c in table.columns
+                      if c.name not in columns and c.default is not None and not c.nullable]
+
+
+def _rows_for(table, columns: list[str], records):
+    converters = {name: _converter(table.c[name]) for name in columns}
+    missing = [name for name in _insert_columns(table, columns) if name not in columns]
+    for record in records:
+        row = {}
+        for name in columns:
+            value = record.get(name)
+            row[name] = _default(table.c[name]) if value is None or value == "" else converters[name](value)
+        for name in missing:
+            row[name] = _default(table.c[name])
+        yield row
+
+
+def chunks(iterable, size: int):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+# --- экспорт ---
+
+def export(directory: str, fmt: str, batch_size: int) -> dict:
+    os.makedirs(directory, exist_ok=True)
+    stats = {}
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, yield_per=batch_size)
+        for name, (table, columns) in TABLES.items():
+            pk = list(table.primary_key.columns)
+            rows = conn.execute(select(*[table.c[c] for c in columns]).order_by(*pk))
+            stats[name] = write_rows(_path(directory, name, fmt), fmt, columns, rows)
+        rows = conn.execute(
+            select(PostHashtag.post_id, Hashtag.tag).join(Hashtag, Hashtag.id == PostHashtag.hashtag_id)
+            .order_by(PostHashtag.post_id, Hashtag.tag)
+        )
+        stats["hashtags"] = write_rows(_path(directory, "hashtags", fmt), fmt, ["post_id", "tag"], rows)
+    return stats
+
+
+# --- импорт ---
+
+def _use_copy(db: Session) -> bool:
+    bind = db.get_bind()
+    return bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg"
+
+
+def insert_batch(db: Session, table, columns: list[str], rows: list[dict]) -> None:
+    if not rows:
+        return
+    if _use_copy(db):
+        cursor = db.connection().connection.dbapi_connection.cursor()
+        with cursor.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([row[c] for c in columns])
+        return
+    db.execute(table.insert(), rows)
+
+
+def _extract_batch(posts: list[tuple[int, str]]) -> list[tuple[int, str]]:
+    return [(post_id, tag) for post_id, text_ in posts for tag in extract_hashtags(text_)]
+
+
+def bounded_map(executor, fn, batches, window: int):
+    # как executor.map, но в работе не больше window пачек — память не растёт с размером входа
+    pending = deque()
+    for batch in batches:
+        pending.append(executor.submit(fn, batch))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class TagLinker:
+    # tag -> hashtag_id в памяти процесса (тегов на порядки меньше, чем постов)
+    def __init__(self, db: Session):
+        self.db = db
+        self.ids: dict[str, int] = {}
+        self.linked = 0
+
+    def link(self, pairs: list[tuple[int, str]]) -> None:
+        missing = list({tag for _, tag in pairs if tag not in self.ids})
+        for i in range(0, len(missing), 500):
+            self.ids.update(resolve_hashtag_ids(self.db, missing[i:i + 500]))
+        rows = [{"post_id": post_id, "hashtag_id": self.ids[tag]} for post_id, tag in dict.fromkeys(pairs)]
+        insert_batch(self.db, PostHashtag.__table__, ["post_id", "hashtag_id"], rows)
+        self.linked += len(rows)
+
+
+def _user_records(records, default_hash: str | None):
+    for record in records:
+        if not record.get("hashed_password"):
+            if default_hash is None:
+                raise SystemExit(f"user {record.get('username')!r} has no hashed_password; pass --default-password")
+            record = {**record, "hashed_password": default_hash}
+        yield record
+
+
+def _import_table(db: Session, name: str, records, batch_size: int) -> int:
+    table, columns = TABLES[name]
+    n = 0
+    for batch in chunks(_rows_for(table, columns, records), batch_size):
+        insert_batch(db, table, _insert_columns(table, columns), batch)
+        db.commit()
+        n += len(batch)
+    return n
+
+
+def _reset_sequences(db: Session) -> None:
+    if db.get_bind().dialect.name == "postgresql":
+        for table in ("users", "posts", "hashtags"):
+            db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"))
+
+
+def import_(directory: str, fmt: str, batch_size: int, workers: int, default_password: str | None) -> dict:
+    migrations.upgrade(engine)
+    default_hash = hash_sync(default_password) if default_password else None
+    hashtags_file = _path(directory, "hashtags", fmt)
+    extract = not os.path.exists(hashtags_file)
+    stats = {}
+
+    with SessionLocal() as db, ProcessPoolExecutor(max_workers=workers) as executor:
+        linker = TagLinker(db)
+        for name in ORDER[:-1]:
+            path = _path(directory, name, fmt)
+            if not os.path.exists(path):
+                continue
+            started = time.monotonic()
+            records = read_rows(path, fmt)
+            if name == "users":
+                records = _user_records(records, default_hash)
+            if name == "posts" and extract:
+                # теги извлекаются в пуле процессов, пока основной процесс вставляет посты
+                post_rows = _rows_for(*TABLES["posts"], records)
+                table, columns = TABLES["posts"]
+                n = 0
+
+                def batches():
+                    nonlocal n
+                    for batch in chunks(post_rows, batch_size):
+                        insert_batch(db, table, _insert_columns(table, columns), batch)
+                        n += len(batch)
+                        yield [(row["id"], row["text"] or "") for row in batch]
+
+                for pairs in bounded_map(executor, _extract_batch, batches(), window=workers * 2):
+                    linker.link(pairs)
+                    db.commit()
+                db.commit()
+                stats[name] = n
+            else:
+                stats[name] = _import_table(db, name, records, batch_size)
+            print(f"{name}: {stats[name]} rows in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+        if not extract:
+            for batch in chunks(read_rows(hashtags_file, fmt), batch_size):
+                linker.link([(int(r["post_id"]), r["tag"].lower()) for r in batch])
+                db.commit()
+        stats["post_hashtags"] = linker.linked
+
+        started = time.monotonic()
+        _reset_sequences(db)
+        recount_all(db)
+        timeline.rebuild_timelines(db)
+        timeline.mark_fanout_on_read(db)
+        trending.rebuild(db)
+        db.commit()
+        get_search_backend().reindex_all(db)
+        db.commit()
+        print(f"counters, timelines, trending, search index rebuilt in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    return stats
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.dataio")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command in ("export", "import"):
+        p = sub.add_parser(command)
+        p.add_argument("directory")
+        p.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+        p.add_argument("--batch-size", type=int, default=5000)
+        if command == "import":
+            p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+            p.add_argument("--default-password", default=None,
+                           help="пароль для пользователей без hashed_password (хэшируется один раз)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        stats = export(args.directory, args.format, args.batch_size)
+    else:
+        stats = import_(args.directory, args.format, args.batch_size, args.workers, args.default_password)
+    print(json.dumps(stats, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
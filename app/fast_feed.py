@@ -0,0 +1,138 @@
+import json
+import time
+from datetime import datetime
+from typing import Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from fastapi import Request
+from starlette.responses import Response, StreamingResponse
+from . import schemas
+from .config import settings
+from .database import ReadSessionLocal
+from .hydration import hydrate_posts, load_hashtags, load_viewer_flags
+from .instrumentation import add_serialize_time
+from .models import User, Post
+
+# Быстрый путь для лент (FAST_JSON_ENABLED): посты и авторы читаются строками,
+# собираются в dict в порядке полей FeedResponse и сразу кодируются orjson —
+# без ORM-объектов, PostPublic/UserPublic и повторной валидации response_model.
+# orjson — опциональная зависимость; без него используется json с тем же выводом.
+#
+# С Accept: application/x-ndjson лента отдаётся потоком: по строке JSON на пост
+# (пачками по STREAM_BATCH_SIZE по мере гидрации) и последней строкой
+# {"next_offset": ..., "next_cursor": ...}.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+POST_COLUMNS = (
+    Post.id, Post.author_id, Post.text, Post.created_at, Post.updated_at, Post.edited,
+    Post.original_post_id, Post.likes_count, Post.reposts_count,
+)
+USER_COLUMNS = (
+    User.id, User.username, User.display_name, User.bio,
+    User.followers_count, User.following_count, User.posts_count,
+)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = dumps(content)
+        add_serialize_time(time.perf_counter() - started)
+        return body
+
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+
+def load_authors(db: Session, user_ids: set[int]) -> dict[int, dict]:
+    if not user_ids:
+        return {}
+    rows = db.execute(select(*USER_COLUMNS).where(User.id.in_(list(user_ids)))).all()
+    return {row.id: row._asdict() for row in rows}
+
+
+# posts — строки с POST_COLUMNS или ORM Post (нужны только атрибуты)
+def hydrate_feed(db: Session, posts: Sequence, current_user: User | None = None) -> list[dict]:
+    if not posts:
+        return []
+    post_ids = [p.id for p in posts]
+    authors = load_authors(db, {p.author_id for p in posts})
+    hashtags = load_hashtags(db, post_ids)
+    liked, reposted = load_viewer_flags(db, post_ids, current_user)
+    return [
+        {
+            "id": p.id,
+            "author": authors[p.author_id],
+            "text": p.text,
+            "created_at": p.created_at,
+            "updated_at": p.updated_at,
+            "edited": p.edited,
+            "original_post_id": p.original_post_id,
+            "likes_count": p.likes_count,
+            "reposts_count": p.reposts_count,
+            "liked_by_me": p.id in liked,
+            "reposted_by_me": p.id in reposted,
+            "hashtags": hashtags.get(p.id, []),
+        }
+        for p in posts
+    ]
+
+
+def ndjson_response(posts: Sequence, current_user: User | None = None,
+                   next_offset: int | None = None, next_cursor: str | None = None) -> StreamingResponse:
+    # тело читается уже после выхода из ручки, когда сессия запроса закрыта, —
+    # поэтому у потока своя сессия; posts — строки или уже загруженные объекты
+    def lines():
+        with ReadSessionLocal() as db:
+            for start in range(0, len(posts), settings.STREAM_BATCH_SIZE):
+                batch = hydrate_feed(db, posts[start:start + settings.STREAM_BATCH_SIZE], current_user)
+                yield b"".join(dumps(item) + b"\n" for item in batch)
+        yield dumps({"next_offset": next_offset, "next_cursor": next_cursor}) + b"\n"
+
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+
+class FeedOutput:
+    # зависимость для ручек лент: как читать страницу и в каком виде её отдать
+    def __init__(self, request: Request):
+        self.stream = wants_ndjson(request)
+        self.fast = settings.FAST_JSON_ENABLED
+
+    @property
+    def columns(self):
+        # колонки для paginate(..., columns=...): в быстром и потоковом режимах — строки вместо ORM
+        return POST_COLUMNS if self.stream or self.fast else None
+
+    def respond(self, db: Session, posts: Sequence, current_user: User | None = None,
+                next_offset: int | None = None, next_cursor: str | None = None):
+        if self.stream:
+            return ndjson_response(posts, current_user, next_offset, next_cursor)
+        if self.fast:
+            return FastJSONResponse({
+                "items": hydrate_feed(db, posts, current_user),
+                "next_offset": next_offset,
+                "next_cursor": next_cursor,
+            })
+        return schemas.FeedResponse(items=hydrate_posts(db, posts, current_user), next_offset=next_offset, next_cursor=next_cursor)
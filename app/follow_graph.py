@@ -0,0 +1,170 @@
+import heapq
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .cache import TTLCache
+from .config import settings
+from .database import ReadSessionLocal
+from .models import Follow
+
+log = logging.getLogger(__name__)
+
+# Граф подписок в памяти процесса: для каждого пользователя — отсортированный
+# array('q') id тех, на кого он подписан (8 байт на ребро). Строится одним проходом
+# по follows в порядке первичного ключа, после follow/unfollow меняется точечно
+# (копия массива — читатели без блокировок), раз в FOLLOW_GRAPH_REFRESH_SECONDS
+# перестраивается целиком в фоновом потоке — пока строится новый, запросы читают старый.
+# Изменения из других воркеров приходят через realtime-события (REALTIME_BACKEND=redis),
+# иначе — только с перестройкой.
+# По графу: «кого почитать» — друзья друзей, ранжированные по числу общих подписок, и
+# is_following для профиля (бинарный поиск; без redis — точечный запрос по ключу follows,
+# потому что своя подписка, сделанная через другой воркер, должна быть видна сразу).
+
+_EMPTY = array("q")
+
+
+def _load() -> dict[int, array]:
+    following: dict[int, array] = {}
+    with ReadSessionLocal() as db:
+        rows = db.execute(
+            select(Follow.follower_id, Follow.following_id)
+            .order_by(Follow.follower_id, Follow.following_id)
+            .execution_options(yield_per=10000)
+        )
+        current, ids = None, _EMPTY
+        for follower_id, following_id in rows:
+            if follower_id != current:
+                current, ids = follower_id, array("q")
+                following[follower_id] = ids
+            ids.append(following_id)
+    return following
+
+
+class FollowGraph:
+    def __init__(self):
+        self._following: dict[int, array] = {}
+        self._built_at: float | None = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._refreshing = False
+        # изменения, пришедшие во время перестройки, доигрываются на новый граф
+        self._journal: list[tuple[int, int, bool]] | None = None
+        self._suggestions = TTLCache(maxsize=10000, ttl=settings.FOLLOW_SUGGESTIONS_TTL)
+        self.edges = 0
+
+    @property
+    def users(self) -> int:
+        return len(self._following)
+
+    def ensure(self) -> None:
+        # первая сборка — синхронно (графа ещё нет), дальше устаревший граф
+        # перестраивается в фоне, а запросы продолжают читать текущий
+        if self._built_at is None:
+            with self._rebuild_lock:
+                if self._built_at is None:
+                    self.rebuild()
+            return
+        if time.monotonic() - self._built_at > settings.FOLLOW_GRAPH_REFRESH_SECONDS and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh, name="follow-graph-rebuild", daemon=True).start()
+
+    def _refresh(self) -> None:
+        try:
+            with self._rebuild_lock:
+                self.rebuild()
+        except Exception:
+            log.exception("follow graph rebuild failed")
+        finally:
+            self._refreshing = False
+
+    def rebuild(self) -> None:
+        with self._lock:
+            self._journal = []
+        try:
+            following = _load()
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            for follower_id, following_id, add in self._journal:
+                self._apply(following, follower_id, following_id, add)
+            self._journal = None
+            self._following = following
+            self.edges = sum(len(ids) for ids in following.values())
+            self._built_at = time.monotonic()
+        self._suggestions.clear()
+
+    @staticmethod
+    def _apply(following: dict[int, array], follower_id: int, following_id: int, add: bool) -> bool:
+        ids = following.get(follower_id, _EMPTY)
+        i = bisect_left(ids, following_id)
+        present = i < len(ids) and ids[i] == following_id
+        if add == present:
+            return False
+        ids = array("q", ids)
+        if add:
+            ids.insert(i, following_id)
+        else:
+            del ids[i]
+        following[follower_id] = ids
+        return True
+
+    def update(self, follower_id: int, following_id: int, add: bool) -> None:
+        # идемпотентно: повтор того же события ничего не меняет
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((follower_id, following_id, add))
+            if self._apply(self._following, follower_id, following_id, add):
+                self.edges += 1 if add else -1
+        self._suggestions.pop(follower_id)
+
+    def on_event(self, channel: str, event: dict) -> None:
+        # слушатель realtime-брокера: {"type": "following"} в канале user:<follower_id>
+        if event.get("type") == "following" and channel.startswith("user:"):
+            self.update(int(channel[5:]), int(event["author_id"]), bool(event["following"]))
+
+    def following(self, user_id: int) -> array:
+        return self._following.get(user_id, _EMPTY)
+
+    def is_following(self, follower_id: int, following_id: int) -> bool:
+        self.ensure()
+        ids = self.following(follower_id)
+        i = bisect_left(ids, following_id)
+        return i < len(ids) and ids[i] == following_id
+
+    def suggestions(self, user_id: int, limit: int) -> list[tuple[int, int]]:
+        # -> [(user_id, общих подписок)] по убыванию; у равных — кто раньше зарегистрировался
+        self.ensure()
+        ranked = self._suggestions.get(user_id)
+        if ranked is None:
+            mine = self.following(user_id)
+            mutual: dict[int, int] = defaultdict(int)
+            # у тех, кто подписан на тысячи, смотрим только первых FOLLOW_GRAPH_MAX_NEIGHBORS
+            for friend in mine[:settings.FOLLOW_GRAPH_MAX_NEIGHBORS]:
+                for candidate in self.following(friend):
+                    mutual[candidate] += 1
+            mutual.pop(user_id, None)
+            for followed in mine:
+                mutual.pop(followed, None)
+            ranked = heapq.nlargest(settings.FOLLOW_SUGGESTIONS_MAX, mutual.items(), key=lambda kv: (kv[1], -kv[0]))
+            self._suggestions.set(user_id, ranked)
+        return ranked[:limit]
+
+
+graph = FollowGraph()
+
+
+def is_following(db: Session, follower_id: int, following_id: int) -> bool:
+    if settings.REALTIME_BACKEND == "redis":
+        return graph.is_following(follower_id, following_id)
+    return db.scalar(select(Follow.follower_id).where(
+        Follow.follower_id == follower_id, Follow.following_id == following_id)) is not None
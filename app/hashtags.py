@@ -0,0 +1,40 @@
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from .database import dialect_insert
+from .models import Hashtag, Post, PostHashtag
+from . import trending, postings
+
+# Хэштеги поста резолвятся одним IN-запросом, недостающие вставляются пачкой
+# через INSERT ... ON CONFLICT DO NOTHING — без flush на каждый тег и без
+# гонки двух постов за один новый тег на уникальном Hashtag.tag.
+
+
+def resolve_hashtag_ids(db: Session, tags: list[str]) -> dict[str, int]:
+    if not tags:
+        return {}
+    found = dict(db.execute(select(Hashtag.tag, Hashtag.id).where(Hashtag.tag.in_(tags))).all())
+    missing = [t for t in tags if t not in found]
+    if missing:
+        insert = dialect_insert(db)
+        db.execute(insert(Hashtag).values([{"tag": t} for t in missing]).on_conflict_do_nothing(index_elements=["tag"]))
+        found.update(db.execute(select(Hashtag.tag, Hashtag.id).where(Hashtag.tag.in_(missing))).all())
+    return found
+
+
+# -> (добавленные, удалённые) hashtag_id; заодно обновляет счётчики трендов
+# в бакете времени создания поста (так удаление/правка попадают в тот же бакет)
+def set_post_hashtags(db: Session, post: Post, hashtag_ids, is_new: bool = False) -> tuple[set[int], set[int]]:
+    wanted = set(hashtag_ids)
+    current = set() if is_new else set(db.scalars(select(PostHashtag.hashtag_id).where(PostHashtag.post_id == post.id)).all())
+    added, removed = wanted - current, current - wanted
+    if removed:
+        db.execute(delete(PostHashtag).where(PostHashtag.post_id == post.id, PostHashtag.hashtag_id.in_(removed)))
+    if added:
+        db.execute(PostHashtag.__table__.insert().values([{"post_id": post.id, "hashtag_id": h} for h in added]))
+    trending.record(db, {**{h: 1 for h in added}, **{h: -1 for h in removed}}, post.created_at)
+    postings.touch(db, added | removed)
+    return added, removed
+
+
+def tag_post(db: Session, post: Post, tags: list[str], is_new: bool = False) -> tuple[set[int], set[int]]:
+    return set_post_hashtags(db, post, resolve_hashtag_ids(db, tags).values(), is_new=is_new)
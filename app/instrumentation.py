@@ -0,0 +1,226 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from starlette.responses import JSONResponse
+from .config import settings
+
+# Метрики на запрос: число SQL-запросов, время в БД, самые медленные запросы,
+# ожидание соединения из пула и время сериализации ответа. Отдаются в
+# заголовке Server-Timing, копятся по маршрутам для /metrics (формат Prometheus)
+# и, с вероятностью SLOW_REQUEST_SAMPLE_RATE, пишутся в лог для медленных запросов.
+
+log = logging.getLogger("app.slow")
+
+SLOWEST_KEPT = 5
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "pool_wait", "serialize_time", "slowest")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+        self.serialize_time = 0.0
+        self.slowest: list[tuple[float, str]] = []
+
+    def add_query(self, statement: str, elapsed: float) -> None:
+        self.queries += 1
+        self.db_time += elapsed
+        if len(self.slowest) < SLOWEST_KEPT or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+
+# --- SQLAlchemy ---
+
+# время старта — на контексте выполнения самого запроса: он живёт ровно один
+# запрос, поэтому упавший запрос ничего не оставляет на соединении
+
+def _record(context, statement: str) -> None:
+    started = getattr(context, "_query_start", None)
+    if started is None:
+        return
+    context._query_start = None
+    stats = _current.get()
+    if stats is not None:
+        stats.add_query(statement, time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record(context, statement)
+
+
+def _handle_error(exception_context) -> None:
+    # упавший запрос тоже занимал БД — учитываем его время
+    _record(exception_context.execution_context, exception_context.statement)
+
+
+def instrument_engine(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool, который засекает, сколько запрос ждал свободное соединение
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait += time.perf_counter() - started
+
+
+def add_serialize_time(elapsed: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.serialize_time += elapsed
+
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        add_serialize_time(time.perf_counter() - started)
+        return body
+
+
+# --- агрегаты по маршрутам ---
+
+class RouteMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: dict[tuple[str, str, str], int] = defaultdict(int)
+        self._sums: dict[tuple[str, str], dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._buckets: dict[tuple[str, str], list[int]] = defaultdict(lambda: [0] * len(HISTOGRAM_BUCKETS))
+
+    def observe(self, method: str, route: str, status: int, duration: float, stats: RequestStats) -> None:
+        key = (method, route)
+        with self._lock:
+            self._requests[(method, route, str(status))] += 1
+            sums = self._sums[key]
+            sums["request_seconds"] += duration
+            sums["request_count"] += 1
+            sums["db_queries"] += stats.queries
+            sums["db_seconds"] += stats.db_time
+            sums["pool_wait_seconds"] += stats.pool_wait
+            sums["serialize_seconds"] += stats.serialize_time
+            buckets = self._buckets[key]
+            for i, bound in enumerate(HISTOGRAM_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), n in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (method, route), buckets in sorted(self._buckets.items()):
+                labels = f'method="{method}",route="{route}"'
+                for bound, n in zip(HISTOGRAM_BUCKETS, buckets):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+                sums = self._sums[(method, route)]
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {int(sums["request_count"])}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {sums["request_seconds"]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {int(sums["request_count"])}')
+            for name, metric in (
+                ("db_queries", "http_request_db_queries_total"),
+                ("db_seconds", "http_request_db_seconds_total"),
+                ("pool_wait_seconds", "http_request_pool_wait_seconds_total"),
+                ("serialize_seconds", "http_request_serialize_seconds_total"),
+            ):
+                lines.append(f"# TYPE {metric} counter")
+                for (method, route), sums in sorted(self._sums.items()):
+                    value = int(sums[name]) if name == "db_queries" else f"{sums[name]:.6f}"
+                    lines.append(f'{metric}{{method="{method}",route="{route}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+route_metrics = RouteMetrics()
+
+
+def _route_of(scope, cache_hit: bool) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # ответ из кэша отдан до роутинга — путь не подставляем, чтобы не плодить метки
+    return "cache-hit" if cache_hit else "unmatched"
+
+
+def _server_timing(stats: RequestStats, total: float) -> bytes:
+    return (
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+        f"pool;dur={stats.pool_wait * 1000:.2f}, "
+        f"ser;dur={stats.serialize_time * 1000:.2f}, "
+        f"total;dur={total * 1000:.2f}"
+    ).encode()
+
+
+def _log_slow(method: str, route: str, status: int, duration: float, stats: RequestStats) -> None:
+    if duration * 1000 < settings.SLOW_REQUEST_MS or random.random() >= settings.SLOW_REQUEST_SAMPLE_RATE:
+        return
+    slowest = "; ".join(f"{elapsed * 1000:.1f}ms {statement[:200]!r}" for elapsed, statement in stats.slowest)
+    log.warning(
+        "slow request %s %s -> %s in %.1fms: %d queries, db %.1fms, pool wait %.1fms, serialize %.1fms; slowest: %s",
+        method, route, status, duration * 1000, stats.queries, stats.db_time * 1000,
+        stats.pool_wait * 1000, stats.serialize_time * 1000, slowest,
+    )
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        cache_hit = False
+
+        async def send_wrapper(message):
+            nonlocal status, cache_hit
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                cache_hit = (b"x-cache", b"HIT") in message.get("headers", [])
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            duration = time.perf_counter() - started
+            route = _route_of(scope, cache_hit)
+            route_metrics.observe(scope["method"], route, status, duration, stats)
+            if settings.SLOW_REQUEST_SAMPLE_RATE > 0:
+                _log_slow(scope["method"], route, status, duration, stats)
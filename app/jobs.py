@@ -0,0 +1,266 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Callable
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import SessionLocal, dialect_insert
+from .models import Job, Post
+from .hashtags import tag_post
+from .utils import extract_hashtags
+from .search_index import get_backend as get_search_backend
+from . import timeline
+from . import response_cache
+
+log = logging.getLogger(__name__)
+
+# Фоновые задачи для побочных эффектов записи: теги и тренды, поисковый индекс, fan-out.
+# enqueue() пишет строку в jobs в той же транзакции, что и сама запись: задача не
+# теряется при падении процесса и не появляется, если запись откатилась. Воркеры —
+# потоки в процессах приложения (JOBS_WORKERS) и/или отдельный python -m app.jobs worker —
+# забирают готовые задачи условным UPDATE (работает и на SQLite, где нет SKIP LOCKED).
+# Обработчик и отметка done коммитятся одной транзакцией, поэтому эффекты в БД
+# применяются ровно один раз; при ошибке — повтор с экспоненциальной задержкой,
+# после JOBS_MAX_ATTEMPTS — failed. Ключ идемпотентности не даёт поставить одну и ту
+# же задачу дважды. С JOBS_ENABLED=false обработчик выполняется сразу в транзакции
+# запроса, как раньше.
+#
+#   python -m app.jobs worker --threads 4
+#   python -m app.jobs status | retry-failed | purge --days 7
+
+Handler = Callable[[Session, dict], None]
+_handlers: dict[str, tuple[Handler, Callable[[dict], None] | None]] = {}
+
+
+def handler(kind: str, on_done: Callable[[dict], None] | None = None):
+    # on_done(payload) — после commit задачи (сброс кэшей и т.п.); в inline-режиме не
+    # вызывается: ручка сама сбрасывает кэш после своего commit
+    def register(fn: Handler) -> Handler:
+        _handlers[kind] = (fn, on_done)
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: dict, key: str | None = None) -> None:
+    if not settings.JOBS_ENABLED:
+        _handlers[kind][0](db, payload)
+        return
+    insert = dialect_insert(db)
+    db.execute(
+        insert(Job).values(kind=kind, payload=json.dumps(payload), idempotency_key=key, run_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+    db.info["jobs_enqueued"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(db: Session) -> None:
+    if db.info.pop("jobs_enqueued", False):
+        job_workers.wake()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_enqueued(db: Session, previous_transaction) -> None:
+    db.info.pop("jobs_enqueued", None)
+
+
+def _ready(now: datetime):
+    # в очереди и пора запускать, или воркер взял и пропал (аренда истекла)
+    return or_(
+        and_(Job.status == "queued", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+def _claim(db: Session) -> tuple[int, str, str, int] | None:
+    now = datetime.utcnow()
+    candidates = db.scalars(select(Job.id).where(_ready(now)).order_by(Job.run_at, Job.id).limit(5)).all()
+    for job_id in candidates:
+        # несколько воркеров могут выбрать один id — UPDATE пройдёт только у одного
+        claimed = db.execute(
+            update(Job).where(Job.id == job_id, _ready(now))
+            .values(status="running", attempts=Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=settings.JOBS_LEASE_SECONDS))
+            .returning(Job.kind, Job.payload, Job.attempts)
+        ).first()
+        db.commit()
+        if claimed is not None:
+            return (job_id, *claimed)
+    return None
+
+
+def run_one() -> bool:
+    # -> False, если готовых задач нет
+    with SessionLocal() as db:
+        claimed = _claim(db)
+        if claimed is None:
+            return False
+        job_id, kind, raw_payload, attempts = claimed
+        fn, on_done = _handlers.get(kind, (None, None))
+        payload = json.loads(raw_payload)
+        try:
+            if fn is None:
+                raise LookupError(f"no handler for job kind {kind!r}")
+            # done — в той же транзакции, что и эффекты; если аренду за это время
+            # перехватил другой воркер (attempts изменился), эффекты откатываются
+            fenced = db.execute(
+                update(Job).where(Job.id == job_id, Job.attempts == attempts)
+                .values(status="done", locked_until=None, finished_at=datetime.utcnow())
+            ).rowcount
+            if not fenced:
+                db.rollback()
+                log.warning("job %s (%s) was taken over by another worker", job_id, kind)
+                return True
+            fn(db, payload)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            log.exception("job %s (%s) attempt %s failed", job_id, kind, attempts)
+            _retry_later(db, job_id, attempts, e)
+            return True
+    job_workers.stats["done"] += 1
+    if on_done is not None:
+        try:
+            on_done(payload)
+        except Exception:
+            log.exception("job %s (%s) on_done failed", job_id, kind)
+    return True
+
+
+def _retry_later(db: Session, job_id: int, attempts: int, error: Exception) -> None:
+    now = datetime.utcnow()
+    failed = attempts >= settings.JOBS_MAX_ATTEMPTS
+    delay = timedelta(seconds=settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    db.execute(
+        update(Job).where(Job.id == job_id, Job.attempts == attempts)
+        .values(status="failed" if failed else "queued", run_at=now + delay, locked_until=None,
+                last_error=repr(error)[:2000], finished_at=now if failed else None)
+    )
+    db.commit()
+    job_workers.stats["failed" if failed else "retried"] += 1
+
+
+class WorkerPool:
+    def __init__(self):
+        self._threads: list[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self.stats = {"done": 0, "retried": 0, "failed": 0}
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if run_one():
+                    continue
+            except Exception:
+                # БД недоступна и т.п. — подождать и попробовать снова
+                log.exception("job worker iteration failed")
+            self._wakeup.wait(settings.JOBS_POLL_INTERVAL)
+            self._wakeup.clear()
+
+    def start(self, threads: int) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(threads):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+
+job_workers = WorkerPool()
+
+
+def counts(db: Session) -> dict[str, int]:
+    return dict(db.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+
+
+def retry_failed(db: Session) -> int:
+    result = db.execute(update(Job).where(Job.status == "failed").values(
+        status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None))
+    db.commit()
+    return result.rowcount
+
+
+def purge(db: Session, days: int) -> int:
+    # выполненные задачи старше days; вместе с ними уходят и их ключи идемпотентности
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.execute(delete(Job).where(Job.status == "done", Job.finished_at < cutoff))
+    db.commit()
+    return result.rowcount
+
+
+# --- задачи ---
+
+def _post_changed(payload: dict) -> None:
+    response_cache.invalidate("feed", f"post:{payload['post_id']}")
+
+
+def _sync_post(db: Session, post: Post) -> None:
+    # теги и индекс выводятся из текущего текста — повтор или опоздавшая задача безвредны
+    tag_post(db, post, extract_hashtags(post.text))
+    get_search_backend().index_post(db, post.id, post.text)
+
+
+@handler("post.created", on_done=_post_changed)
+def post_created(db: Session, payload: dict) -> None:
+    post = db.get(Post, payload["post_id"])
+    if post is None:
+        # удалён раньше, чем дошла очередь
+        return
+    _sync_post(db, post)
+    timeline.push_post(db, post)
+
+
+@handler("post.edited", on_done=_post_changed)
+def post_edited(db: Session, payload: dict) -> None:
+    post = db.get(Post, payload["post_id"])
+    if post is not None:
+        _sync_post(db, post)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_worker = sub.add_parser("worker", help="обрабатывать очередь до Ctrl+C")
+    p_worker.add_argument("--threads", type=int, default=settings.JOBS_WORKERS or 1)
+    sub.add_parser("status")
+    sub.add_parser("retry-failed")
+    p_purge = sub.add_parser("purge")
+    p_purge.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        logging.basicConfig(level=logging.INFO)
+        job_workers.start(args.threads)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            job_workers.stop()
+        return 0
+    with SessionLocal() as db:
+        if args.command == "status":
+            print(json.dumps(counts(db), indent=2))
+        elif args.command == "retry-failed":
+            print(retry_failed(db))
+        else:
+            print(purge(db, args.days))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
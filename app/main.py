@@ -1,16 +1,40 @@
 import os
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
-from .database import engine
-from .models import Base
+from .database import engine, SessionLocal, dispose_async_engine
+from . import migrations
+from .search_index import get_backend as get_search_backend
+from . import passwords
+from . import realtime
+from . import ratelimit
+from . import postings
+from . import warmup
+from . import jobs
+from .follow_graph import graph as follow_graph
+from .config import settings
+from .counters import counter_buffer
+from .response_cache import ResponseCacheMiddleware
+from .compression import CompressionMiddleware
+from .instrumentation import InstrumentationMiddleware, TimedJSONResponse, route_metrics
+from .auth import _token_cache, _user_cache
 from .routers import auth as auth_router
 from .routers import users as users_router
 from .routers import posts as posts_router
 from .routers import feed as feed_router
 from .routers import search as search_router
+from .routers import realtime as realtime_router
 
-app = FastAPI(title="Bailanysta API")
+app = FastAPI(title="Bailanysta API", default_response_class=TimedJSONResponse,
+              dependencies=[Depends(ratelimit.global_limit)])
+
+# add_middleware оборачивает снаружи: CORS должен остаться внешним, чтобы
+# и ответы из кэша получали CORS-заголовки
+app.add_middleware(ResponseCacheMiddleware)
+# сжатие снаружи кэша: в кэше лежат несжатые тела, кодировка выбирается под каждого клиента
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(InstrumentationMiddleware)
 
 origins = os.getenv("CORS_ORIGINS", "*")
 origins_list = [o.strip() for o in origins.split(",")] if origins else ["*"]
@@ -24,16 +48,84 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    if settings.MIGRATE_ON_STARTUP:
+        migrations.upgrade(engine)
+    # после миграций: проверяет, что поисковый индекс есть (иначе — LIKE)
+    get_search_backend()
+    if settings.COUNTER_BUFFER_ENABLED:
+        counter_buffer.start(settings.COUNTER_FLUSH_INTERVAL)
+    if settings.JOBS_ENABLED and settings.JOBS_WORKERS:
+        jobs.job_workers.start(settings.JOBS_WORKERS)
+    if settings.REALTIME_BACKEND == "redis":
+        # подписки/отписки из других воркеров — в граф этого процесса, сбросы postings — в его кэш
+        realtime.get_broker().add_listener(follow_graph.on_event)
+        realtime.get_broker().add_listener(postings.on_event)
+
+@app.on_event("startup")
+async def on_startup_warmup():
+    # после миграций: воркер начинает принимать запросы уже прогретым
+    if settings.WARMUP_ON_STARTUP:
+        await warmup.warm(app)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    passwords.shutdown()
+    counter_buffer.stop()
+    jobs.job_workers.stop()
+    realtime.shutdown()
+    await dispose_async_engine()
 
 app.include_router(auth_router.router)
 app.include_router(users_router.router)
 app.include_router(posts_router.router)
 app.include_router(feed_router.router)
 app.include_router(search_router.router)
+app.include_router(realtime_router.router)
 
 @app.get("/health")
 def health():
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
     return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    lines = [route_metrics.render().rstrip("\n")]
+    lines.append("# TYPE password_hash_stat gauge")
+    for name, value in passwords.stats.items():
+        lines.append(f'password_hash_stat{{name="{name}"}} {value}')
+    lines.append("# TYPE auth_cache_requests_total counter")
+    for cache_name, cache in (("token", _token_cache), ("user", _user_cache)):
+        lines.append(f'auth_cache_requests_total{{cache="{cache_name}",result="hit"}} {cache.hits}')
+        lines.append(f'auth_cache_requests_total{{cache="{cache_name}",result="miss"}} {cache.misses}')
+    lines.append("# TYPE postings_cache_requests_total counter")
+    hits, misses = postings.cache_stats()
+    lines.append(f'postings_cache_requests_total{{result="hit"}} {hits}')
+    lines.append(f'postings_cache_requests_total{{result="miss"}} {misses}')
+    lines.append("# TYPE concurrency_limit_in_flight gauge")
+    for name, slots in ratelimit.concurrency_limits.items():
+        lines.append(f'concurrency_limit_in_flight{{route="{name}"}} {slots.in_flight}')
+    lines.append("# TYPE concurrency_limit_rejected_total counter")
+    for name, slots in ratelimit.concurrency_limits.items():
+        lines.append(f'concurrency_limit_rejected_total{{route="{name}"}} {slots.rejected}')
+    if settings.JOBS_ENABLED:
+        lines.append("# TYPE jobs_processed_total counter")
+        for result, value in jobs.job_workers.stats.items():
+            lines.append(f'jobs_processed_total{{result="{result}"}} {value}')
+        lines.append("# TYPE jobs gauge")
+        with SessionLocal() as db:
+            for status, value in jobs.counts(db).items():
+                lines.append(f'jobs{{status="{status}"}} {value}')
+    lines.append("# TYPE follow_graph_size gauge")
+    lines.append(f'follow_graph_size{{kind="users"}} {follow_graph.users}')
+    lines.append(f'follow_graph_size{{kind="edges"}} {follow_graph.edges}')
+    if realtime._broker is not None:
+        broker = realtime._broker
+        lines.append("# TYPE realtime_connections gauge")
+        lines.append(f"realtime_connections {broker.connections}")
+        lines.append("# TYPE realtime_events_total counter")
+        lines.append(f'realtime_events_total{{stage="published"}} {broker.published}')
+        lines.append(f'realtime_events_total{{stage="delivered"}} {broker.delivered}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,62 @@
+import importlib
+import pkgutil
+from datetime import datetime
+from sqlalchemy import Engine, MetaData, Table, Column, String, DateTime, select, text
+
+# Версионные миграции схемы вместо Base.metadata.create_all на каждом старте.
+# Миграция — модуль vNNNN_<name>.py с функцией upgrade(conn); применённые версии
+# пишутся в schema_migrations. Каждая миграция идёт в своей транзакции и должна
+# быть идемпотентной (checkfirst / IF NOT EXISTS): базы, созданные раньше через
+# create_all, догоняются без ошибок.
+#
+#   python -m app.migrations            # применить недостающие
+#   python -m app.migrations status
+#   python -m app.migrations check      # EXPLAIN горячих запросов: используются ли индексы
+
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# чтобы несколько воркеров gunicorn не накатывали одно и то же одновременно
+PG_LOCK_KEY = 727274
+
+
+def available() -> list[tuple[str, object]]:
+    names = sorted(m.name for m in pkgutil.iter_modules(__path__) if m.name.startswith("v"))
+    return [(name, importlib.import_module(f"{__name__}.{name}")) for name in names]
+
+
+def applied(bind: Engine) -> set[str]:
+    with bind.begin() as conn:
+        metadata.create_all(conn)
+        return set(conn.scalars(select(schema_migrations.c.version)).all())
+
+
+def pending(bind: Engine) -> list[str]:
+    done = applied(bind)
+    return [name for name, _ in available() if name not in done]
+
+
+def upgrade(bind: Engine) -> list[str]:
+    ran = []
+    with bind.connect() as lock_conn:
+        if bind.dialect.name == "postgresql":
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": PG_LOCK_KEY})
+            lock_conn.commit()
+        try:
+            done = applied(bind)
+            for name, module in available():
+                if name in done:
+                    continue
+                with bind.begin() as conn:
+                    module.upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(version=name, applied_at=datetime.utcnow()))
+                ran.append(name)
+        finally:
+            if bind.dialect.name == "postgresql":
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PG_LOCK_KEY})
+                lock_conn.commit()
+    return ran
@@ -0,0 +1,24 @@
+import sys
+from ..database import engine
+from . import upgrade, available, applied
+from .explain import check
+
+command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+
+if command == "upgrade":
+    ran = upgrade(engine)
+    print("applied: " + (", ".join(ran) if ran else "nothing, schema is up to date"))
+elif command == "status":
+    done = applied(engine)
+    for name, _ in available():
+        print(f"{'x' if name in done else ' '} {name}")
+elif command == "check":
+    failed = 0
+    for name, index, ok, plan in check(engine):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}: {index}")
+        if not ok:
+            failed += 1
+            print("     " + plan.replace("\n", "\n     "))
+    sys.exit(1 if failed else 0)
+else:
+    sys.exit(f"unknown command {command!r}; use upgrade | status | check")
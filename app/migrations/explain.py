@@ -0,0 +1,61 @@
+import json
+from sqlalchemy import Engine, select, func, text
+from ..auth import _user_by_login_stmt
+from ..models import User, Post, Follow, Like
+from ..pagination import apply_cursor
+from ..postings import postings_stmt
+from ..timeline import home_timeline_stmt
+
+# EXPLAIN горячих запросов из роутеров: в плане должен встречаться ожидаемый индекс.
+# На PostgreSQL seq scan выключается на время проверки — на маленькой или пустой
+# базе планировщик иначе честно выберет его, и проверка говорила бы о статистике,
+# а не о том, подходит ли индекс к запросу.
+
+
+def hot_queries():
+    # (название, запрос, индекс, который он должен использовать)
+    return [
+        ("posts by author (GET /posts?author=)",
+         apply_cursor(select(Post).where(Post.author_id == 1), None).limit(20),
+         "ix_posts_author_created_id"),
+        ("reposted_by_me (hydration)",
+         select(Post.original_post_id).where(Post.author_id == 1, Post.original_post_id.in_([1, 2, 3])),
+         "ix_posts_original_author"),
+        ("followers of a user (counters, fan-out)",
+         select(func.count()).select_from(Follow).where(Follow.following_id == 1),
+         "ix_follows_following_follower"),
+        ("likes of a post (likes_count recount)",
+         select(func.count()).select_from(Like).where(Like.post_id == 1),
+         "ix_likes_post_id"),
+        ("posts by hashtag (GET /search?q=#tag, postings)",
+         postings_stmt(1, 10001),
+         "ix_post_hashtags_hashtag_post"),
+        ("login by email (POST /auth/login)",
+         _user_by_login_stmt("someone@example.com"),
+         "ix_users_email_lower"),
+        ("home timeline (GET /feed/following)",
+         home_timeline_stmt(1).limit(20),
+         "ix_timeline_user_created_post"),
+        ("user by username (GET /users/{username})",
+         select(User).where(User.username == "someone"),
+         "ix_users_username"),
+    ]
+
+
+def explain(conn, stmt) -> str:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        return json.dumps(conn.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar())
+    return "\n".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+def check(bind: Engine) -> list[tuple[str, str, bool, str]]:
+    results = []
+    with bind.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, stmt, index in hot_queries():
+            plan = explain(conn, stmt)
+            results.append((name, index, index in plan, plan))
+        conn.rollback()
+    return results
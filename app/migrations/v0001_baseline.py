@@ -0,0 +1,9 @@
+from ..models import Base
+
+# Исходные таблицы. На уже существующей базе (create_all до миграций) — ничего не делает.
+
+TABLES = ["users", "posts", "follows", "likes", "hashtags", "post_hashtags"]
+
+
+def upgrade(conn) -> None:
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[name] for name in TABLES], checkfirst=True)
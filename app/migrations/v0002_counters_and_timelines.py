@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from ..models import Base
+from ..counters import recount_user_counters
+from .. import timeline, trending
+
+# Денормализованные счётчики пользователя, материализованные ленты и бакеты трендов.
+# create_all не добавляет колонки в существующие таблицы — здесь это делается явно,
+# а новые колонки/таблицы сразу заполняются из исходных данных.
+
+USER_COUNTERS = ["followers_count", "following_count", "posts_count"]
+
+
+def upgrade(conn) -> None:
+    inspector = inspect(conn)
+    existing = {c["name"] for c in inspector.get_columns("users")}
+    added = [name for name in USER_COUNTERS if name not in existing]
+    for name in added:
+        conn.execute(text(f"ALTER TABLE users ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+
+    new_tables = [name for name in ("timeline_entries", "hashtag_buckets") if not inspector.has_table(name)]
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[name] for name in new_tables], checkfirst=True)
+
+    db = Session(bind=conn)
+    if added:
+        recount_user_counters(db)
+    if "timeline_entries" in new_tables:
+        timeline.rebuild_timelines(db)
+    if "hashtag_buckets" in new_tables:
+        trending.rebuild(db)
+    db.flush()
@@ -0,0 +1,32 @@
+from sqlalchemy.schema import CreateIndex
+from ..models import Base
+
+# Индексы горячих запросов (проверяются python -m app.migrations check):
+#   posts (author_id, created_at, id)            — посты автора, keyset-пагинация
+#   posts (original_post_id, author_id) partial  — reposted_by_me
+#   follows (following_id, follower_id)          — подписчики: счётчики, fan-out
+#   likes (post_id)                              — пересчёт likes_count, каскадное удаление
+#   post_hashtags (hashtag_id, post_id)          — посты по тегу
+#   users lower(email)                           — логин по email
+#   timeline_entries (user_id, created_at, post_id), hashtag_buckets (bucket_start)
+# На PostgreSQL большие таблицы лучше проиндексировать заранее через
+# CREATE INDEX CONCURRENTLY с теми же именами — тогда здесь они будут пропущены.
+
+INDEXES = [
+    ("posts", "ix_posts_author_created_id"),
+    ("posts", "ix_posts_original_author"),
+    ("follows", "ix_follows_following_follower"),
+    ("likes", "ix_likes_post_id"),
+    ("post_hashtags", "ix_post_hashtags_hashtag_post"),
+    ("users", "ix_users_email_lower"),
+    ("timeline_entries", "ix_timeline_user_created_post"),
+    ("hashtag_buckets", "ix_hashtag_buckets_bucket_start"),
+]
+
+
+def upgrade(conn) -> None:
+    for table_name, index_name in INDEXES:
+        table = Base.metadata.tables[table_name]
+        index = next(i for i in table.indexes if i.name == index_name)
+        # IF NOT EXISTS, а не checkfirst: рефлексия SQLite не видит индексы по выражению (lower(email))
+        conn.execute(CreateIndex(index, if_not_exists=True))
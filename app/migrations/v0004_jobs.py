@@ -0,0 +1,7 @@
+from ..models import Job
+
+# Таблица фоновых задач (app/jobs.py)
+
+
+def upgrade(conn) -> None:
+    Job.__table__.create(conn, checkfirst=True)
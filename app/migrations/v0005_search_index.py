@@ -0,0 +1,12 @@
+from ..search_index import create_schema
+
+# Полнотекстовый индекс постов (app/search_index.py): на PostgreSQL — колонка
+# posts.search_vector, GIN-индекс и заполнение существующих постов, на SQLite — FTS5.
+# Раньше это делалось на старте каждого воркера; ALTER TABLE берёт ACCESS EXCLUSIVE,
+# а UPDATE всех постов на большой таблице долгий — теперь это один раз при деплое.
+# На большой базе PostgreSQL индекс можно заранее построить CREATE INDEX CONCURRENTLY
+# ix_posts_search_vector, а колонку заполнить батчами — здесь тогда почти ничего не останется.
+
+
+def upgrade(conn) -> None:
+    create_schema(conn)
@@ -0,0 +1,14 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+from .. import timeline
+
+# users.fanout_on_read: посты «тяжёлого» автора не раскладываются по лентам и должны
+# подмешиваться при чтении, даже когда он опустится ниже TIMELINE_FANOUT_MAX_FOLLOWERS.
+# Для существующих пользователей флаг выводится из нынешнего числа подписчиков — так же
+# ленты раскладывал rebuild_timelines.
+
+
+def upgrade(conn) -> None:
+    if "fanout_on_read" not in {c["name"] for c in inspect(conn).get_columns("users")}:
+        conn.execute(text("ALTER TABLE users ADD COLUMN fanout_on_read BOOLEAN NOT NULL DEFAULT FALSE"))
+        timeline.mark_fanout_on_read(Session(bind=conn))
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import String, ForeignKey, Integer, DateTime, Text, Boolean
+from sqlalchemy import String, ForeignKey, Integer, DateTime, Text, Boolean, Index, func, text as sql_text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 class Base(DeclarativeBase):
@@ -7,12 +7,19 @@ class Base(DeclarativeBase):
 
 class Follow(Base):
     __tablename__ = "follows"
+    __table_args__ = (
+        # подписчики пользователя: счётчики, fan-out, backfill
+        Index("ix_follows_following_follower", "following_id", "follower_id"),
+    )
     follower_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     following_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        Index("ix_likes_post_id", "post_id"),
+    )
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -27,10 +34,31 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
+    followers_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    following_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    posts_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # у автора есть посты, не разложенные по лентам (был «тяжёлым») — timeline подмешивает их при чтении
+    fanout_on_read: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
     posts: Mapped[list["Post"]] = relationship(back_populates="author", cascade="all, delete-orphan")
 
+    # логин по email без учёта регистра (auth._user_by_login_stmt)
+    __table_args__ = (
+        Index("ix_users_email_lower", func.lower(email)),
+    )
+
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # ленты автора и keyset-пагинация по (created_at, id)
+        Index("ix_posts_author_created_id", "author_id", "created_at", "id"),
+        # reposted_by_me; частичный — репостов мало по сравнению с постами
+        Index(
+            "ix_posts_original_author", "original_post_id", "author_id",
+            sqlite_where=sql_text("original_post_id IS NOT NULL"),
+            postgresql_where=sql_text("original_post_id IS NOT NULL"),
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     text: Mapped[str] = mapped_column(Text)
@@ -52,5 +80,52 @@ class Hashtag(Base):
 
 class PostHashtag(Base):
     __tablename__ = "post_hashtags"
+    __table_args__ = (
+        # посты по тегу (поиск по #tag, тренды)
+        Index("ix_post_hashtags_hashtag_post", "hashtag_id", "post_id"),
+    )
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    hashtag_id: Mapped[int] = mapped_column(ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True)
+
+class TimelineEntry(Base):
+    # материализованная домашняя лента: посты тех, на кого подписан user_id
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        Index("ix_timeline_user_created_post", "user_id", "created_at", "post_id"),
+    )
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    author_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class HashtagBucket(Base):
+    # сколько постов с тегом создано в интервале [bucket_start, bucket_start + TRENDING_BUCKET_SECONDS)
+    __tablename__ = "hashtag_buckets"
+    __table_args__ = (
+        Index("ix_hashtag_buckets_bucket_start", "bucket_start"),
+    )
     hashtag_id: Mapped[int] = mapped_column(ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+class Job(Base):
+    # очередь фоновых задач (app/jobs.py); строка создаётся в транзакции основной записи
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # выборка готовых к запуску: status = 'queued' AND run_at <= now
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    # повторный enqueue с тем же ключом ничего не добавляет
+    idempotency_key: Mapped[str | None] = mapped_column(String(128), unique=True, nullable=True)
+    # queued | running | done | failed
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    # аренда: running-задача, чей воркер умер, после этого времени берётся снова
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
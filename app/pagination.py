@@ -0,0 +1,49 @@
+import base64
+import binascii
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import Session
+from .models import Post
+
+# Курсор — непрозрачная строка с (created_at, id) последнего поста страницы.
+# Keyset-пагинация идёт по индексу и не пересчитывает пропущенные строки,
+# поэтому 500-я страница стоит столько же, сколько первая.
+
+
+def encode_cursor(created_at: datetime, post_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{post_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, post_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(post_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_cursor(stmt: Select, cursor: str | None, created_col=Post.created_at, id_col=Post.id) -> Select:
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(created_col, id_col) < tuple_(created_at, post_id))
+    return stmt.order_by(created_col.desc(), id_col.desc())
+
+
+# -> (items, next_offset, next_cursor); offset оставлен для старых клиентов.
+# columns — вернуть строки с этими колонками вместо ORM-объектов
+def paginate(db: Session, stmt: Select, limit: int, cursor: str | None = None, offset: int = 0, columns=None):
+    stmt = apply_cursor(stmt, cursor)
+    if not cursor and offset:
+        stmt = stmt.offset(offset)
+    if columns:
+        items = db.execute(stmt.with_only_columns(*columns, maintain_column_froms=True).limit(limit)).all()
+    else:
+        items = db.scalars(stmt.limit(limit)).all()
+    if len(items) < limit:
+        return items, None, None
+    last = items[-1]
+    next_offset = None if cursor else offset + limit
+    return items, next_offset, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from .config import settings
+
+# bcrypt — CPU-bound (~100-300 мс на хэш). Чтобы всплеск логинов не занимал общий
+# threadpool, в котором крутятся синхронные ручки (лента, посты), хэширование
+# идёт в отдельный ограниченный executor со своим лимитом очереди и метриками.
+
+# passlib и CryptContext нужны только ручкам логина/регистрации — создаются при
+# первом хэшировании, а не при импорте (в режиме process — в каждом процессе пула)
+_context = None
+
+
+def get_context():
+    global _context
+    if _context is None:
+        from passlib.context import CryptContext
+        _context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _context
+
+
+def warm() -> None:
+    # загрузка и самопроверка bcrypt-бэкенда (~80 мс), иначе их платит первый логин
+    get_context().handler("bcrypt").get_backend()
+
+
+class HashingBusy(Exception):
+    pass
+
+
+_executor: Executor | None = None
+_lock = threading.Lock()
+stats = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "in_flight": 0,
+    "queue_seconds_total": 0.0,
+    "hash_seconds_total": 0.0,
+}
+
+
+def _get_executor() -> Executor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            if settings.PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+            else:
+                _executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+        return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def hash_sync(password: str) -> str:
+    return get_context().hash(password)
+
+
+def verify_sync(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return get_context().verify(plain_password, hashed_password)
+    except ValueError:
+        return False
+
+
+def _timed(fn, submitted_at: float, *args):
+    # monotonic, а не perf_counter: в режиме process время сравнивается между процессами
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started - submitted_at, time.monotonic() - started
+
+
+async def _run(fn, *args):
+    with _lock:
+        if stats["in_flight"] >= settings.PASSWORD_HASH_MAX_PENDING:
+            stats["rejected"] += 1
+            raise HashingBusy()
+        stats["in_flight"] += 1
+        stats["submitted"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        result, queued, spent = await loop.run_in_executor(_get_executor(), _timed, fn, time.monotonic(), *args)
+    finally:
+        with _lock:
+            stats["in_flight"] -= 1
+    with _lock:
+        stats["completed"] += 1
+        stats["queue_seconds_total"] += queued
+        stats["hash_seconds_total"] += spent
+    return result
+
+
+async def hash_password(password: str) -> str:
+    return await _run(hash_sync, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return bool(await _run(verify_sync, plain_password, hashed_password))
@@ -0,0 +1,203 @@
+import heapq
+from array import array
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from .cache import TTLCache
+from .config import settings
+from .models import Hashtag, Post, PostHashtag
+from .pagination import decode_cursor, encode_cursor
+from . import realtime
+
+# Postings хэштегов: для каждого тега — его посты по убыванию (created_at, id), как в
+# ленте. Список читается из post_hashtags (индекс hashtag_id, post_id) одним запросом
+# и кэшируется в процессе (LRU + TTL); мутации тегов поста сбрасывают его после commit.
+# Поиск по нескольким #тегам — пересечение (all) или слияние без дублей (any)
+# отсортированных списков, страница — от курсора бинарным поиском.
+# В кэше — не больше POSTINGS_MAX_LENGTH свежих постов тега; если страница уходит
+# глубже, поиск делается SQL-запросом (tag_filter).
+# Кэш у каждого воркера свой. С REALTIME_BACKEND=redis сброс рассылается остальным
+# воркерам событием в канале "postings"; без redis они видят изменения тегов с
+# опозданием до POSTINGS_CACHE_TTL.
+
+_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+
+
+def _key(created_at: datetime, post_id: int) -> tuple[int, int]:
+    return (created_at - _EPOCH) // _US, post_id
+
+
+class Postings:
+    # два array('q') вместо списка кортежей: 16 байт на пост
+    __slots__ = ("ts", "ids", "complete")
+
+    def __init__(self, rows, complete: bool):
+        self.ts = array("q")
+        self.ids = array("q")
+        for created_at, post_id in rows:
+            ts, _ = _key(created_at, post_id)
+            self.ts.append(ts)
+            self.ids.append(post_id)
+        # False — список обрезан, постов тега старше последнего в кэше нет
+        self.complete = complete
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def key(self, i: int) -> tuple[int, int]:
+        return self.ts[i], self.ids[i]
+
+    def seek(self, key: tuple[int, int], lo: int = 0, strict: bool = False) -> int:
+        # первый i >= lo с key(i) <= key (strict: < key)
+        hi = len(self.ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = self.key(mid)
+            if k > key or (strict and k == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def keys(self, start: int):
+        for i in range(start, len(self.ids)):
+            yield self.ts[i], self.ids[i]
+
+
+_postings = TTLCache(maxsize=settings.POSTINGS_CACHE_SIZE, ttl=settings.POSTINGS_CACHE_TTL)
+# tag -> hashtag_id; теги не удаляются и не переименовываются
+_tag_ids = TTLCache(maxsize=10000, ttl=3600)
+
+
+def tag_ids(db: Session, tags: list[str]) -> dict[str, int]:
+    found = {}
+    for tag in tags:
+        hashtag_id = _tag_ids.get(tag)
+        if hashtag_id is not None:
+            found[tag] = hashtag_id
+    missing = [t for t in tags if t not in found]
+    if missing:
+        for tag, hashtag_id in db.execute(select(Hashtag.tag, Hashtag.id).where(Hashtag.tag.in_(missing))).all():
+            _tag_ids.set(tag, hashtag_id)
+            found[tag] = hashtag_id
+    return found
+
+
+def postings_stmt(hashtag_id: int, limit: int):
+    # загрузка списка тега; тот же запрос проверяет python -m app.migrations check
+    return (
+        select(Post.created_at, Post.id).join(PostHashtag, PostHashtag.post_id == Post.id)
+        .where(PostHashtag.hashtag_id == hashtag_id)
+        .order_by(Post.created_at.desc(), Post.id.desc()).limit(limit)
+    )
+
+
+def get_postings(db: Session, hashtag_id: int) -> Postings:
+    postings = _postings.get(hashtag_id)
+    if postings is None:
+        n = settings.POSTINGS_MAX_LENGTH
+        rows = db.execute(postings_stmt(hashtag_id, n + 1)).all()
+        postings = Postings(rows[:n], complete=len(rows) <= n)
+        _postings.set(hashtag_id, postings)
+    return postings
+
+
+def intersect(lists: list[Postings], after: tuple[int, int] | None, limit: int) -> list[tuple[int, int]] | None:
+    # -> ключи постов, которые есть во всех списках; None — не хватило кэша
+    lists = sorted(lists, key=len)
+    driver, others = lists[0], lists[1:]
+    i = driver.seek(after, strict=True) if after else 0
+    pos = [p.seek(after, strict=True) if after else 0 for p in others]
+    out = []
+    while len(out) < limit:
+        if i == len(driver):
+            return out if driver.complete else None
+        k = driver.key(i)
+        i += 1
+        for j, p in enumerate(others):
+            pos[j] = p.seek(k, pos[j])
+            if pos[j] == len(p):
+                return out if p.complete else None
+            if p.key(pos[j]) != k:
+                break
+        else:
+            out.append(k)
+    return out
+
+
+def union(lists: list[Postings], after: tuple[int, int] | None, limit: int) -> list[tuple[int, int]] | None:
+    # -> ключи постов хотя бы из одного списка, без дублей; None — не хватило кэша
+    truncated = [p.key(len(p) - 1) for p in lists if not p.complete and len(p)]
+    floor = max(truncated) if truncated else None
+    merged = heapq.merge(*(p.keys(p.seek(after, strict=True) if after else 0) for p in lists), reverse=True)
+    out = []
+    for k in merged:
+        if floor is not None and k < floor:
+            return None
+        if out and out[-1] == k:
+            continue
+        out.append(k)
+        if len(out) == limit:
+            return out
+    return out if floor is None else None
+
+
+def page(db: Session, hashtag_ids: list[int], mode: str, limit: int, cursor: str | None = None, columns=None):
+    # -> (посты, next_cursor) или None, если страница глубже кэша
+    lists = [get_postings(db, h) for h in hashtag_ids]
+    after = _key(*decode_cursor(cursor)) if cursor else None
+    keys = (intersect if mode == "all" else union)(lists, after, limit)
+    if keys is None:
+        return None
+    ids = [post_id for _, post_id in keys]
+    stmt = select(*columns) if columns else select(Post)
+    stmt = stmt.where(Post.id.in_(ids))
+    rows = db.execute(stmt).all() if columns else db.scalars(stmt).all()
+    by_id = {row.id: row for row in rows}
+    items = [by_id[i] for i in ids if i in by_id]
+    if len(keys) < limit:
+        return items, None
+    ts, post_id = keys[-1]
+    return items, encode_cursor(_EPOCH + ts * _US, post_id)
+
+
+def tag_filter(stmt, hashtag_ids: list[int], mode: str):
+    # то же через SQL: без join, поэтому пост с несколькими тегами не дублируется
+    tagged = select(PostHashtag.post_id).where(PostHashtag.hashtag_id.in_(hashtag_ids))
+    if mode == "all" and len(hashtag_ids) > 1:
+        tagged = tagged.group_by(PostHashtag.post_id).having(func.count() == len(hashtag_ids))
+    return stmt.where(Post.id.in_(tagged))
+
+
+def touch(db: Session, hashtag_ids) -> None:
+    # сбросить postings тегов после commit (до него другие сессии видят старые данные)
+    if hashtag_ids:
+        db.info.setdefault("postings_dirty", set()).update(hashtag_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_dirty(db: Session) -> None:
+    dirty = db.info.pop("postings_dirty", None)
+    if not dirty:
+        return
+    for hashtag_id in dirty:
+        _postings.pop(hashtag_id)
+    if settings.REALTIME_BACKEND == "redis":
+        realtime.publish("postings", {"type": "postings.evict", "hashtag_ids": sorted(dirty)})
+
+
+def on_event(channel: str, event: dict) -> None:
+    # слушатель realtime-брокера: сброс из другого воркера
+    if channel == "postings" and event.get("type") == "postings.evict":
+        for hashtag_id in event["hashtag_ids"]:
+            _postings.pop(hashtag_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_dirty(db: Session, previous_transaction) -> None:
+    db.info.pop("postings_dirty", None)
+
+
+def cache_stats() -> tuple[int, int]:
+    return _postings.hits, _postings.misses
@@ -0,0 +1,184 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+from .auth import _decode_token
+from .config import settings
+from .redis_client import get_redis
+
+# Token bucket: ведро на burst токенов, пополняется со скоростью rate в секунду,
+# каждый запрос забирает токен. Ключ — (область, IP / пользователь / логин).
+# Бэкенды: memory — в пределах процесса (у каждого воркера свои вёдра),
+# redis — общие для всех воркеров (атомарно, Lua-скриптом).
+# Отдельно — лимит одновременных запросов на дорогие ручки: лишние получают 503
+# сразу, а не стоят в очереди threadpool, мешая остальным.
+#
+# Лимиты в настройках — строки "N/second|minute|hour" (burst = N); пустая строка — без лимита.
+
+_RATE = re.compile(r"^\s*(\d+)\s*/\s*(second|minute|hour|day)\s*$")
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(spec: str) -> tuple[float, int] | None:
+    # -> (токенов в секунду, burst)
+    if not spec:
+        return None
+    m = _RATE.match(spec)
+    if not m:
+        raise ValueError(f"bad rate limit {spec!r}, expected e.g. '10/minute'")
+    n = int(m.group(1))
+    if n == 0:
+        # 0/minute — ведро без токенов: отказ навсегда, а не «без лимита»
+        raise ValueError(f"bad rate limit {spec!r}, expected e.g. '10/minute'")
+    return n / _PERIODS[m.group(2)], n
+
+
+class MemoryBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -> (пропустить?, через сколько секунд появится токен)
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+_TAKE_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or burst
+local ts = tonumber(data[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(retry)}
+"""
+
+
+class RedisBackend:
+    # client — redis.Redis или любой объект с register_script
+    def __init__(self, client, prefix: str = "bl:rl:"):
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_LUA)
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> tuple[bool, float]:
+        allowed, retry = self._take(keys=[self.prefix + key], args=[rate, burst, time.time(), cost])
+        return bool(int(allowed)), float(retry)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_BACKEND == "redis":
+            _backend = RedisBackend(get_redis())
+        else:
+            _backend = MemoryBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+    return _backend
+
+
+def client_ip(conn: HTTPConnection) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = conn.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return conn.client.host if conn.client else "unknown"
+
+
+def client_user(conn: HTTPConnection) -> str | None:
+    # пользователь из токена без похода в БД; невалидный токен лимитируется по IP
+    auth = conn.headers.get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    claims = _decode_token(auth[7:])
+    if claims is None:
+        return None
+    user_id, username = claims
+    return f"u{user_id}" if user_id is not None else f"n{username}"
+
+
+def too_many(retry_after: float) -> HTTPException:
+    return HTTPException(status_code=429, detail="Too many requests",
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+def hit(scope: str, key: str, spec: str) -> None:
+    # забрать токен или бросить 429 с Retry-After
+    rate = parse_rate(spec)
+    if rate is None or not settings.RATE_LIMIT_ENABLED:
+        return
+    allowed, retry_after = get_backend().take(f"{scope}:{key}", *rate)
+    if not allowed:
+        raise too_many(retry_after)
+
+
+def limit(scope: str, setting: str, per: str = "ip"):
+    # зависимость: per = "ip" | "user" (аноним — по IP)
+    def dependency(conn: HTTPConnection) -> None:
+        user = client_user(conn) if per == "user" else None
+        hit(scope, user or f"ip:{client_ip(conn)}", getattr(settings, setting))
+    return dependency
+
+
+def global_limit(conn: HTTPConnection) -> None:
+    # общий лимит на клиента по всем ручкам
+    user = client_user(conn)
+    hit("global", user or f"ip:{client_ip(conn)}", settings.RATE_LIMIT_GLOBAL)
+
+
+class ConcurrencyLimit:
+    def __init__(self, name: str, setting: str):
+        self.name = name
+        self.setting = setting
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    async def __call__(self):
+        maximum = getattr(settings, self.setting)
+        with self._lock:
+            if maximum and self.in_flight >= maximum:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Server is busy, try again later", headers={"Retry-After": "1"})
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+concurrency_limits: dict[str, ConcurrencyLimit] = {}
+
+
+def concurrency(name: str, setting: str) -> ConcurrencyLimit:
+    concurrency_limits[name] = ConcurrencyLimit(name, setting)
+    return concurrency_limits[name]
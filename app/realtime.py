@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from .config import settings
+from .redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+# Pub/sub для realtime-ленты (SSE / WebSocket). Каналы:
+#   author:<id> — новые посты/репосты автора и лайки его постов (подписаны его читатели и он сам)
+#   user:<id>   — личные события: на тебя подписались, ты подписался/отписался
+#   public      — все новые посты (по желанию клиента)
+# Публикуют синхронные ручки после commit (из threadpool), доставка — в asyncio-очереди
+# соединений. Очередь ограничена REALTIME_QUEUE_SIZE: если клиент не успевает читать,
+# его очередь сбрасывается и он получает одно событие {"type": "resync"} — перечитать
+# ленту целиком. С REALTIME_BACKEND=redis события идут через Redis PUBLISH, и каждый
+# воркер раздаёт их своим соединениям.
+
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    def __init__(self, channels, maxsize: int):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.channels: set[str] = set(channels)
+        self.dropped = 0
+
+    def offer(self, event: dict) -> None:
+        # вызывается только в потоке event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    def __init__(self):
+        self._subs: dict[str, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        # fn(channel, event) на каждое доставленное событие (например, граф подписок)
+        self._listeners: list = []
+
+    @property
+    def connections(self) -> int:
+        with self._lock:
+            return len({sub for subs in self._subs.values() for sub in subs})
+
+    def subscribe(self, channels, maxsize: int | None = None) -> Subscription:
+        sub = Subscription(channels, maxsize or settings.REALTIME_QUEUE_SIZE)
+        with self._lock:
+            for channel in sub.channels:
+                self._subs[channel].add(sub)
+        return sub
+
+    def update(self, sub: Subscription, add=(), remove=()) -> None:
+        with self._lock:
+            for channel in remove:
+                sub.channels.discard(channel)
+                self._subs[channel].discard(sub)
+                if not self._subs[channel]:
+                    del self._subs[channel]
+            for channel in add:
+                sub.channels.add(channel)
+                self._subs[channel].add(sub)
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self.update(sub, remove=list(sub.channels))
+
+    def add_listener(self, fn) -> None:
+        self._listeners.append(fn)
+
+    def dispatch(self, channel: str, event: dict) -> None:
+        # локальная доставка; безопасно вызывать из любого потока
+        for fn in self._listeners:
+            try:
+                fn(channel, event)
+            except Exception:
+                log.exception("realtime listener failed on %s", channel)
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for sub in subs:
+            sub.loop.call_soon_threadsafe(sub.offer, event)
+        self.delivered += len(subs)
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.published += 1
+        self.dispatch(channel, event)
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class RedisBroker(Broker):
+    # client — redis.Redis или любой объект с publish/pubsub (для тестов — локальный фейк)
+    def __init__(self, client, prefix: str = "bl:rt:"):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def publish(self, channel: str, event: dict) -> None:
+        self.published += 1
+        self.client.publish(self.prefix + channel, json.dumps(event))
+
+    def _listen(self) -> None:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.prefix + "*")
+        try:
+            while not self._stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if not message:
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                try:
+                    self.dispatch(channel[len(self.prefix):], json.loads(message["data"]))
+                except ValueError:
+                    log.warning("bad realtime message on %s", channel)
+        finally:
+            pubsub.close()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name="realtime-redis", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+_broker: Broker | None = None
+_broker_lock = threading.Lock()
+
+
+def get_broker() -> Broker:
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = RedisBroker(get_redis()) if settings.REALTIME_BACKEND == "redis" else Broker()
+            _broker.start()
+        return _broker
+
+
+def shutdown() -> None:
+    global _broker
+    with _broker_lock:
+        if _broker is not None:
+            _broker.stop()
+            _broker = None
+
+
+def publish(channel: str, event: dict) -> None:
+    # realtime — не повод ронять запрос, который уже закоммичен
+    try:
+        get_broker().publish(channel, event)
+    except Exception:
+        log.exception("realtime publish to %s failed", channel)
+
+
+# --- события домена ---
+
+def post_created(post) -> None:
+    event = {"type": "repost" if post.original_post_id else "post", "post_id": post.id,
+             "author_id": post.author_id, "original_post_id": post.original_post_id}
+    publish(f"author:{post.author_id}", event)
+    publish("public", event)
+
+
+def post_liked(post_id: int, author_id: int, user_id: int) -> None:
+    publish(f"author:{author_id}", {"type": "like", "post_id": post_id, "user_id": user_id})
+
+
+def follow_changed(follower_id: int, author_id: int, following: bool) -> None:
+    if following:
+        publish(f"user:{author_id}", {"type": "follow", "follower_id": follower_id})
+    # соединения самого подписчика добавляют/убирают канал author:<id>
+    publish(f"user:{follower_id}", {"type": "following", "author_id": author_id, "following": following})
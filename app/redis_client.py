@@ -0,0 +1,19 @@
+from .config import settings
+
+# Общий Redis-клиент (кэш ответов и т.п.). Пакет redis — опциональная зависимость:
+# нужен только если в настройках выбран redis-бэкенд.
+
+_client = None
+
+
+def get_redis():
+    global _client
+    if _client is None:
+        if not settings.REDIS_URL:
+            raise RuntimeError("REDIS_URL is not configured")
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("redis backend requires the 'redis' package") from e
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
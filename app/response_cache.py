@@ -0,0 +1,177 @@
+import hashlib
+import itertools
+import re
+import threading
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+from .cache import TTLCache
+from .compression import identity_etag
+from .config import settings
+from .fast_feed import NDJSON
+from .redis_client import get_redis
+
+# Кэш ответов для анонимных GET (лента, пост, посты автора, профиль): у всех
+# незалогиненных одинаковый ответ. Инвалидация — через версии областей ("feed",
+# "post:<id>", "user:<username>"): мутация ставит области новую версию, а она входит
+# в ключ, так что старые записи просто перестают находиться и вытесняются по LRU/TTL.
+# Версии тоже живут ограниченно (LRU/TTL, в Redis — EXPIRE). Вместо потерянной версии
+# выдаётся новое, ещё не использованное число из общего счётчика — никогда не старое,
+# поэтому вытеснение версии означает лишь промах кэша.
+
+CACHED_ROUTES = [
+    (re.compile(r"^/feed/public$"), lambda m: ["feed"]),
+    (re.compile(r"^/posts$"), lambda m: ["feed"]),
+    (re.compile(r"^/posts/(\d+)$"), lambda m: [f"post:{m.group(1)}"]),
+    (re.compile(r"^/users/(?!me$)([^/]+)$"), lambda m: [f"user:{m.group(1)}"]),
+]
+
+
+# версия области живёт в несколько раз дольше записи: иначе лишние промахи
+VERSION_TTL_FACTOR = 4
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: int):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = TTLCache(maxsize=maxsize * VERSION_TTL_FACTOR, ttl=ttl * VERSION_TTL_FACTOR)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        return self._entries.get(key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries.set(key, value, ttl=ttl)
+
+    def versions(self, scopes: list[str]) -> list[int]:
+        result = []
+        for s in scopes:
+            version = self._versions.get(s)
+            if version is None:
+                with self._lock:
+                    version = next(self._seq)
+                self._versions.set(s, version)
+            result.append(version)
+        return result
+
+    def bump(self, scopes: list[str]) -> None:
+        for s in scopes:
+            with self._lock:
+                version = next(self._seq)
+            self._versions.set(s, version)
+
+
+class RedisBackend:
+    # client — redis.Redis или любой объект с get/set(ex=, nx=)/mget/incr
+    def __init__(self, client, prefix: str = "bl:resp:", ttl: int = 30):
+        self.client = client
+        self.prefix = prefix
+        self.version_ttl = ttl * VERSION_TTL_FACTOR
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def versions(self, scopes: list[str]) -> list[int]:
+        keys = [f"{self.prefix}ver:{s}" for s in scopes]
+        result = []
+        for key, value in zip(keys, self.client.mget(keys)):
+            if value is None:
+                # версии нет (не было или истекла) — новое число; при гонке побеждает первый SET NX.
+                # Если чужая версия успела истечь между SET и GET — берём своё: оно тоже ещё не занято
+                fresh = self.client.incr(f"{self.prefix}ver-seq")
+                if self.client.set(key, fresh, nx=True, ex=self.version_ttl):
+                    value = fresh
+                else:
+                    value = self.client.get(key) or fresh
+            result.append(int(value))
+        return result
+
+    def bump(self, scopes: list[str]) -> None:
+        for s in scopes:
+            self.client.set(f"{self.prefix}ver:{s}", self.client.incr(f"{self.prefix}ver-seq"), ex=self.version_ttl)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None and settings.RESPONSE_CACHE_BACKEND != "off":
+        if settings.RESPONSE_CACHE_BACKEND == "redis":
+            _backend = RedisBackend(get_redis(), ttl=settings.RESPONSE_CACHE_TTL)
+        else:
+            _backend = MemoryBackend(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL)
+    return _backend
+
+
+def invalidate(*scopes: str) -> None:
+    backend = get_backend()
+    if backend is not None and scopes:
+        backend.bump(list(scopes))
+
+
+def _scopes_for(path: str) -> list[str] | None:
+    for pattern, scopes in CACHED_ROUTES:
+        m = pattern.match(path)
+        if m:
+            return scopes(m)
+    return None
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _etag_match(if_none_match: str | None, etag: str) -> str | None:
+    # -> совпавший валидатор клиента. Список через запятую, слабые (W/"..."), "*" и
+    # валидаторы сжатых представлений ("...-gzip", см. compression.encoded_etag)
+    if not if_none_match:
+        return None
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        if identity_etag(candidate.removeprefix("W/")) == etag:
+            return candidate.removeprefix("W/")
+    return None
+
+
+def _respond(request: Request, etag: str, body: bytes, cache_status: str) -> Response:
+    headers = {"ETag": etag, "X-Cache": cache_status}
+    matched = _etag_match(request.headers.get("if-none-match"), etag)
+    if matched is not None:
+        # 304 не сжимается: валидатор — того представления, что лежит у клиента
+        return Response(status_code=304, headers={**headers, "ETag": matched})
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        backend = get_backend()
+        if backend is None or request.method != "GET" or "authorization" in request.headers:
+            return await call_next(request)
+        # NDJSON-поток не буферизуем и не кэшируем
+        if NDJSON in request.headers.get("accept", ""):
+            return await call_next(request)
+        scopes = _scopes_for(request.url.path)
+        if scopes is None:
+            return await call_next(request)
+
+        versions = backend.versions(scopes)
+        key = f"{request.url.path}?{request.url.query}|" + ",".join(map(str, versions))
+        cached = backend.get(key)
+        if cached is not None:
+            etag, body = cached.split(b"\n", 1)
+            return _respond(request, etag.decode(), body, "HIT")
+
+        response = await call_next(request)
+        if response.status_code != 200 or response.headers.get("content-type") != "application/json":
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = _etag(body)
+        backend.set(key, etag.encode() + b"\n" + body, settings.RESPONSE_CACHE_TTL)
+        return _respond(request, etag, body, "MISS")
@@ -1,48 +1,63 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from .. import schemas
-from ..auth import authenticate_user, create_access_token, get_password_hash, get_db
+from ..auth import authenticate_user_async, create_access_token, get_async_db
 from ..models import User
+from .. import passwords
+from .. import ratelimit
+from ..config import settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.post("/signup", response_model=schemas.UserPublic, status_code=201)
-def signup(payload: schemas.UserCreate, db: Session = Depends(get_db)):
+def _hashing_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Server is busy, try again later", headers={"Retry-After": "1"})
+
+@router.post("/signup", response_model=schemas.UserPublic, status_code=201,
+             dependencies=[Depends(ratelimit.limit("signup", "RATE_LIMIT_SIGNUP"))])
+async def signup(payload: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     email_norm = (payload.email or None)
     if email_norm:
         email_norm = email_norm.strip().lower()
-    if email_norm and db.scalar(select(User).where(func.lower(User.email) == email_norm)):
+    if email_norm and await db.scalar(select(User).where(func.lower(User.email) == email_norm)):
         raise HTTPException(status_code=400, detail="Email already in use")
-    existing = db.scalar(select(User).where(User.username == payload.username))
+    existing = await db.scalar(select(User).where(User.username == payload.username))
     if existing:
         raise HTTPException(status_code=400, detail="Username already taken")
-    if payload.email and db.scalar(select(User).where(User.email == payload.email)):
+    if payload.email and await db.scalar(select(User).where(User.email == payload.email)):
         raise HTTPException(status_code=400, detail="Email already in use")
+    try:
+        hashed_password = await passwords.hash_password(payload.password)
+    except passwords.HashingBusy:
+        raise _hashing_busy()
     user = User(
         username=payload.username,
         email=email_norm,
         display_name=payload.display_name,
         bio=payload.bio,
-        hashed_password=get_password_hash(payload.password),
+        hashed_password=hashed_password,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
-    return schemas.UserPublic(
-        id=user.id,
-        username=user.username,
-        display_name=user.display_name,
-        bio=user.bio,
-        followers_count=0, following_count=0, posts_count=0,
-    )
+    await db.commit()
+    await db.refresh(user)
+    return schemas.UserPublic.model_validate(user)
 
-@router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+@router.post("/login", response_model=schemas.Token,
+             dependencies=[Depends(ratelimit.limit("login", "RATE_LIMIT_LOGIN"))])
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(),
+                db: AsyncSession = Depends(get_async_db)):
+    # подбор пароля к одному аккаунту: ведро на пару (логин, IP). Ведро только по логину
+    # позволило бы любому заблокировать вход жертве; цена — подбор с множества IP
+    # этот лимит не останавливает, его сдерживает только RATE_LIMIT_LOGIN по IP
+    account = form_data.username.strip().lower()
+    ratelimit.hit("login-account", f"{account}:{ratelimit.client_ip(request)}", settings.RATE_LIMIT_LOGIN_ACCOUNT)
+    try:
+        user = await authenticate_user_async(db, form_data.username, form_data.password)
+    except passwords.HashingBusy:
+        raise _hashing_busy()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username or password")
-    token = create_access_token(subject=user.username, expires_delta=timedelta(minutes=60))
+    token = create_access_token(subject=user.username, expires_delta=timedelta(minutes=60), user_id=user.id)
     return schemas.Token(access_token=token)
@@ -1,66 +1,49 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, exists, and_
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
 from ..auth import get_db, get_current_user, get_current_user_optional
 from .. import schemas
-from ..models import User, Post, Like, Hashtag, PostHashtag
+from ..models import User, Post, Like
 from ..utils import extract_hashtags
+from ..hashtags import set_post_hashtags
+from ..hydration import hydrate_posts
+from ..pagination import paginate
+from ..fast_feed import FeedOutput
+from .. import timeline
+from .. import response_cache
+from .. import realtime
+from .. import ratelimit
+from .. import jobs
+from ..config import settings
+from ..counters import bump_user, bump_post
+from ..database import dialect_insert
+from ..search_index import get_backend as get_search_backend
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
-def _user_public(db: Session, user: User) -> schemas.UserPublic:
-    followers_count = db.scalar(select(func.count()).select_from(User).join_from(User, User.posts, isouter=True).where(User.id == user.id)) or 0
-    following_count = 0
-    posts_count = db.scalar(select(func.count()).select_from(Post).where(Post.author_id == user.id)) or 0
-    return schemas.UserPublic(
-        id=user.id, username=user.username, display_name=user.display_name, bio=user.bio,
-        followers_count=followers_count, following_count=following_count, posts_count=posts_count,
-    )
-
 def _post_to_public(db: Session, post: Post, current_user: User | None = None) -> schemas.PostPublic:
-    liked_by_me = False
-    reposted_by_me = False
-    if current_user:
-        liked_by_me = bool(db.scalar(
-            select(exists().where(and_(Like.user_id == current_user.id, Like.post_id == post.id)))
-        ))
-        reposted_by_me = bool(db.scalar(
-            select(exists().where(and_(Post.author_id == current_user.id, Post.original_post_id == post.id)))
-        ))
+    return hydrate_posts(db, [post], current_user)[0]
 
-    hashtags = []
-    # fetch hashtags for post
-    tags_stmt = select(Hashtag.tag).join(PostHashtag, Hashtag.id == PostHashtag.hashtag_id).where(PostHashtag.post_id == post.id)
-    hashtags = [row[0] for row in db.execute(tags_stmt).all()]
-    return schemas.PostPublic(
-        id=post.id,
-        author=_user_public(db, post.author),
-        text=post.text,
-        created_at=post.created_at,
-        updated_at=post.updated_at,
-        edited=post.edited,
-        original_post_id=post.original_post_id,
-        likes_count=post.likes_count,
-        reposts_count=post.reposts_count,
-        hashtags=hashtags,
-        liked_by_me=liked_by_me,
-        reposted_by_me=reposted_by_me
-    )
+def _written_post(db: Session, post: Post) -> schemas.PostPublic:
+    # ответ на запись: с фоновыми задачами теги могут быть ещё не проставлены — берём их из текста
+    result = _post_to_public(db, post)
+    if settings.JOBS_ENABLED:
+        result.hashtags = extract_hashtags(post.text)
+    return result
 
 @router.post("", response_model=schemas.PostPublic, status_code=201)
 def create_post(payload: schemas.PostCreate, current=Depends(get_current_user), db: Session = Depends(get_db)):
     post = Post(author_id=current.id, text=payload.text)
     db.add(post); db.flush()
-    # hashtags
-    tags = extract_hashtags(payload.text)
-    for t in tags:
-        h = db.scalars(select(Hashtag).where(Hashtag.tag == t)).first()
-        if not h:
-            h = Hashtag(tag=t); db.add(h); db.flush()
-        db.add(PostHashtag(post_id=post.id, hashtag_id=h.id))
+    bump_user(db, current.id, posts_count=1)
+    # теги, индекс и fan-out — задачей (см. app/jobs.py)
+    jobs.enqueue(db, "post.created", {"post_id": post.id}, key=f"post.created:{post.id}")
     db.commit(); db.refresh(post)
-    return _post_to_public(db, post)
+    response_cache.invalidate("feed", f"user:{current.username}")
+    realtime.post_created(post)
+    return _written_post(db, post)
 
 @router.get("/{post_id}", response_model=schemas.PostPublic)
 def get_post(post_id: int, current=Depends(get_current_user_optional), db: Session = Depends(get_db)):
@@ -77,14 +60,10 @@ def edit_post(post_id: int, payload: schemas.PostUpdate, current=Depends(get_cur
     if post.author_id != current.id:
         raise HTTPException(status_code=403, detail="You can edit only your own posts")
     post.text = payload.text; post.edited = True; post.updated_at = datetime.utcnow()
-    db.execute(PostHashtag.__table__.delete().where(PostHashtag.post_id == post.id))
-    for t in extract_hashtags(payload.text):
-        h = db.scalars(select(Hashtag).where(Hashtag.tag == t)).first()
-        if not h:
-            h = Hashtag(tag=t); db.add(h); db.flush()
-        db.add(PostHashtag(post_id=post.id, hashtag_id=h.id))
+    jobs.enqueue(db, "post.edited", {"post_id": post.id}, key=f"post.edited:{post.id}:{post.updated_at.isoformat()}")
     db.commit(); db.refresh(post)
-    return _post_to_public(db, post)
+    response_cache.invalidate("feed", f"post:{post.id}")
+    return _written_post(db, post)
 
 @router.delete("/{post_id}", status_code=204)
 def delete_post(post_id: int, current=Depends(get_current_user), db: Session = Depends(get_db)):
@@ -93,29 +72,51 @@ def delete_post(post_id: int, current=Depends(get_current_user), db: Session = D
         return
     if post.author_id != current.id:
         raise HTTPException(status_code=403, detail="You can delete only your own posts")
-    db.delete(post); db.commit(); return
+    timeline.remove_post(db, post.id)
+    set_post_hashtags(db, post, [])
+    get_search_backend().remove_post(db, post.id)
+    bump_user(db, current.id, posts_count=-1)
+    original_post_id = post.original_post_id
+    if original_post_id:
+        bump_post(db, original_post_id, "reposts_count", -1)
+    db.delete(post); db.commit()
+    response_cache.invalidate("feed", f"post:{post_id}", f"post:{original_post_id}", f"user:{current.username}")
+    return
 
-@router.post("/{post_id}/like", status_code=204)
+@router.post("/{post_id}/like", status_code=204,
+             dependencies=[Depends(ratelimit.limit("like", "RATE_LIMIT_LIKE", per="user"))])
 def like_post(post_id: int, current=Depends(get_current_user), db: Session = Depends(get_db)):
-    post = db.get(Post, post_id)
-    if not post:
+    insert = dialect_insert(db)
+    try:
+        liked = db.execute(
+            insert(Like).values(user_id=current.id, post_id=post_id)
+            .on_conflict_do_nothing().returning(Like.post_id)
+        ).first()
+    except IntegrityError:
+        # FK на posts: поста нет
+        db.rollback()
         raise HTTPException(status_code=404, detail="Post not found")
-    exists = db.execute(select(Like).where(Like.user_id == current.id, Like.post_id == post_id)).scalar()
-    if not exists:
-        db.add(Like(user_id=current.id, post_id=post_id))
-        post.likes_count += 1
-        db.commit()
+    if liked is None:
+        return
+    if not bump_post(db, post_id, "likes_count", 1):
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Post not found")
+    db.commit()
+    response_cache.invalidate("feed", f"post:{post_id}")
+    author_id = db.scalar(select(Post.author_id).where(Post.id == post_id))
+    if author_id is not None:
+        realtime.post_liked(post_id, author_id, current.id)
     return
 
 @router.delete("/{post_id}/like", status_code=204)
 def unlike_post(post_id: int, current=Depends(get_current_user), db: Session = Depends(get_db)):
-    like = db.execute(select(Like).where(Like.user_id == current.id, Like.post_id == post_id)).scalar()
-    if like:
-        db.delete(like)
-        post = db.get(Post, post_id)
-        if post and post.likes_count > 0:
-            post.likes_count -= 1
+    unliked = db.execute(
+        delete(Like).where(Like.user_id == current.id, Like.post_id == post_id).returning(Like.post_id)
+    ).first()
+    if unliked:
+        bump_post(db, post_id, "likes_count", -1)
         db.commit()
+        response_cache.invalidate("feed", f"post:{post_id}")
     return
 
 @router.post("/{post_id}/repost", response_model=schemas.PostPublic, status_code=201)
@@ -127,30 +128,29 @@ def repost_post(post_id: int, current=Depends(get_current_user), db: Session = D
         raise HTTPException(status_code=400, detail="Нельзя репостить свои посты")
     repost = Post(author_id=current.id, text=original.text, original_post_id=original.id)
     db.add(repost); db.flush()
-    original.reposts_count += 1
-    # copy hashtags
-    tags = db.execute(select(PostHashtag.hashtag_id).where(PostHashtag.post_id == original.id)).scalars().all()
-    for hid in tags:
-        db.add(PostHashtag(post_id=repost.id, hashtag_id=hid))
+    bump_post(db, original.id, "reposts_count", 1)
+    bump_user(db, current.id, posts_count=1)
+    # текст тот же, что у оригинала, — задача проставит те же теги
+    jobs.enqueue(db, "post.created", {"post_id": repost.id}, key=f"post.created:{repost.id}")
     db.commit(); db.refresh(repost)
-    return _post_to_public(db, repost)
+    response_cache.invalidate("feed", f"post:{original.id}", f"user:{current.username}")
+    realtime.post_created(repost)
+    return _written_post(db, repost)
 
 
 
 @router.get("", response_model=schemas.FeedResponse)
 def list_posts(author: str | None = Query(default=None),
-               offset: int = 0, limit: int = Query(20, ge=1, le=100),
-               current=Depends(get_current_user_optional), db: Session = Depends(get_db)):
+               offset: int = 0, limit: int = Query(20, ge=1, le=100), cursor: str | None = None,
+               current=Depends(get_current_user_optional), db: Session = Depends(get_db),
+               output: FeedOutput = Depends()):
     stmt = select(Post)
     if author:
         # найти user.id по username
         user = db.scalar(select(User).where(User.username == author))
         if not user:
-            return schemas.FeedResponse(items=[], next_offset=None)
+            return output.respond(db, [], current)
         stmt = stmt.where(Post.author_id == user.id)
 
-    stmt = stmt.order_by(Post.created_at.desc()).offset(offset).limit(limit)
-    items = db.scalars(stmt).all()
-    from .posts import _post_to_public
-    return schemas.FeedResponse(items=[_post_to_public(db, p, current) for p in items],
-                                next_offset=offset + limit if len(items) == limit else None)
\ No newline at end of file
+    items, next_offset, next_cursor = paginate(db, stmt, limit, cursor=cursor, offset=offset, columns=output.columns)
+    return output.respond(db, items, current, next_offset=next_offset, next_cursor=next_cursor)
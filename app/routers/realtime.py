@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from ..auth import oauth2_scheme_optional, resolve_token
+from ..config import settings
+from ..database import ReadSessionLocal
+from ..models import Follow
+from ..realtime import get_broker, Subscription, Broker
+
+router = APIRouter(prefix="/realtime", tags=["realtime"])
+
+log = logging.getLogger(__name__)
+
+# EventSource и браузерный WebSocket не умеют заголовки, поэтому токен можно передать
+# и как ?token=; заголовок Authorization: Bearer, если есть, важнее — токену в URL
+# место в логах прокси, так что клиенты, которые умеют заголовки, должны слать его
+
+
+def _bearer(authorization: str | None) -> str | None:
+    scheme, _, token = (authorization or "").partition(" ")
+    return (token.strip() or None) if scheme.lower() == "bearer" else None
+
+
+def _channels_for(user_id: int, public: bool) -> list[str]:
+    with ReadSessionLocal() as db:
+        authors = db.scalars(select(Follow.following_id).where(Follow.follower_id == user_id)).all()
+    channels = [f"author:{a}" for a in authors] + [f"author:{user_id}", f"user:{user_id}"]
+    return channels + ["public"] if public else channels
+
+
+async def _open(token: str | None, public: bool) -> tuple[Broker, Subscription]:
+    user = await run_in_threadpool(resolve_token, token) if token else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    broker = get_broker()
+    if broker.connections >= settings.REALTIME_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Too many realtime connections",
+                            headers={"Retry-After": str(settings.REALTIME_HEARTBEAT_SECONDS)})
+    channels = await run_in_threadpool(_channels_for, user.id, public)
+    return broker, broker.subscribe(channels)
+
+
+def _apply_control(broker: Broker, sub: Subscription, event: dict) -> None:
+    # подписался/отписался в другой вкладке или на другом воркере — меняем каналы этого соединения
+    if event.get("type") == "following":
+        channel = f"author:{event['author_id']}"
+        if event["following"]:
+            broker.update(sub, add=[channel])
+        else:
+            broker.update(sub, remove=[channel])
+
+
+@router.get("/sse")
+async def sse(request: Request, token: str | None = Query(default=None), public: bool = False,
+              header_token: str | None = Depends(oauth2_scheme_optional)):
+    broker, sub = await _open(header_token or token, public)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await sub.get(settings.REALTIME_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": ping\n\n"
+                    continue
+                _apply_control(broker, sub, event)
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broker.unsubscribe(sub)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _task_done(task: asyncio.Task) -> None:
+    # забираем исключение задачи соединения: WebSocketDisconnect — обычное закрытие,
+    # а незабранное исключение asyncio пишет в лог на каждом отключении
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None and not isinstance(error, WebSocketDisconnect):
+        log.warning("realtime websocket %s failed: %r", task.get_coro().__name__, error)
+
+
+@router.websocket("/ws")
+async def ws(websocket: WebSocket, token: str | None = Query(default=None), public: bool = False):
+    try:
+        broker, sub = await _open(_bearer(websocket.headers.get("authorization")) or token, public)
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code)
+        return
+    await websocket.accept()
+
+    async def pump():
+        while True:
+            event = await sub.get(settings.REALTIME_HEARTBEAT_SECONDS)
+            if event is None:
+                event = {"type": "ping"}
+            _apply_control(broker, sub, event)
+            await websocket.send_json(event)
+
+    async def drain():
+        # входящие сообщения не нужны — читаем, чтобы заметить закрытие
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(drain())]
+    for task in tasks:
+        task.add_done_callback(_task_done)
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # без await: при отмене самого обработчика await здесь не дошёл бы до отписки
+        for task in tasks:
+            task.cancel()
+        broker.unsubscribe(sub)
@@ -1,28 +1,62 @@
+from typing import Literal
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from ..auth import get_db, get_current_user_optional
 from .. import schemas
-from ..models import Post, Hashtag, PostHashtag
+from ..models import Post
+from ..pagination import paginate
+from ..fast_feed import FeedOutput
+from ..search_index import get_backend as get_search_backend
+from .. import trending
+from .. import postings
+from .. import ratelimit
 
 router = APIRouter(prefix="/search", tags=["search"])
 
-@router.get("", response_model=schemas.FeedResponse)
-def search(q: str = Query(..., min_length=1), offset: int = 0, limit: int = Query(20, ge=1, le=100), current=Depends(get_current_user_optional),  db: Session = Depends(get_db)):
+search_slots = ratelimit.concurrency("search", "SEARCH_MAX_CONCURRENT")
+
+@router.get("/trending", response_model=schemas.TrendingResponse)
+def trending_tags(mode: Literal["window", "decay"] = "window", window_hours: int = Query(24, ge=1, le=168),
+                  limit: int = Query(10, ge=1, le=100)):
+    return schemas.TrendingResponse(items=trending.top_k.get(mode, window_hours, limit))
+
+@router.get("", response_model=schemas.FeedResponse,
+            dependencies=[Depends(ratelimit.limit("search", "RATE_LIMIT_SEARCH", per="user")), Depends(search_slots)])
+def search(q: str = Query(..., min_length=1), offset: int = 0, limit: int = Query(20, ge=1, le=100), cursor: str | None = None,
+           order: Literal["recent", "relevance"] = "recent", tags_mode: Literal["any", "all"] = "any",
+           current=Depends(get_current_user_optional), db: Session = Depends(get_db),
+           output: FeedOutput = Depends()):
     terms = [t for t in q.strip().split() if t]
+    if not terms:
+        return output.respond(db, [], current)
+    # одиночный "#" — не тег, а обычное слово
+    words = [t for t in terms if not (t.startswith("#") and len(t) > 1)]
     posts_stmt = select(Post)
 
-    tags = [t[1:].lower() for t in terms if t.startswith("#")]
+    # any — пост хотя бы с одним из #тегов, all — со всеми
+    tags = list(dict.fromkeys(t[1:].lower() for t in terms if t.startswith("#") and len(t) > 1))
     if tags:
-        posts_stmt = posts_stmt.join(PostHashtag, PostHashtag.post_id == Post.id).join(Hashtag, Hashtag.id == PostHashtag.hashtag_id)
-        posts_stmt = posts_stmt.where(Hashtag.tag.in_(tags))
+        found = postings.tag_ids(db, tags)
+        if not found or (tags_mode == "all" and len(found) < len(tags)):
+            return output.respond(db, [], current)
+        hashtag_ids = list(found.values())
+        if not words and (cursor or not offset):
+            # только теги — страница из postings в памяти
+            result = postings.page(db, hashtag_ids, tags_mode, limit, cursor=cursor, columns=output.columns)
+            if result is not None:
+                items, next_cursor = result
+                return output.respond(db, items, current, next_cursor=next_cursor)
+        posts_stmt = postings.tag_filter(posts_stmt, hashtag_ids, tags_mode)
 
-    for kw in [t for t in terms if not t.startswith("#")]:
-        posts_stmt = posts_stmt.where(Post.text.ilike(f"%{kw}%"))
+    posts_stmt, rank = get_search_backend().filter(posts_stmt, words)
 
-    stmt = posts_stmt.order_by(Post.created_at.desc()).offset(offset).limit(limit)
-    items = db.scalars(stmt).all()
-    next_offset = offset + limit if len(items) == limit else None
+    if order == "relevance" and rank is not None:
+        # по релевантности — только offset-пагинация
+        stmt = posts_stmt.order_by(rank.desc(), Post.created_at.desc(), Post.id.desc()).offset(offset).limit(limit)
+        items = db.scalars(stmt).all()
+        next_offset = offset + limit if len(items) == limit else None
+        return output.respond(db, items, current, next_offset=next_offset)
 
-    from .posts import _post_to_public
-    return schemas.FeedResponse(items=[_post_to_public(db, p, current) for p in items], next_offset=next_offset)
+    items, next_offset, next_cursor = paginate(db, posts_stmt, limit, cursor=cursor, offset=offset, columns=output.columns)
+    return output.respond(db, items, current, next_offset=next_offset, next_cursor=next_cursor)
@@ -1,31 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from ..auth import get_db, get_current_user
+from sqlalchemy import select, delete
+from ..auth import get_db, get_current_user, get_current_user_optional
 from .. import schemas
-from ..models import User, Follow, Post
+from ..models import User, Follow
+from .. import timeline
+from .. import response_cache
+from .. import realtime
+from ..counters import bump_user
+from ..database import dialect_insert
+from ..hydration import load_users_public
+from ..follow_graph import graph, is_following
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.get("/me", response_model=schemas.UserPublic)
+@router.get("/me", response_model=schemas.UserProfile)
 def get_me(current=Depends(get_current_user), db: Session = Depends(get_db)):
     return get_user_public(db, current.username)
 
-@router.get("/{username}", response_model=schemas.UserPublic)
-def get_user(username: str, db: Session = Depends(get_db)):
-    return get_user_public(db, username)
+@router.get("/{username}", response_model=schemas.UserProfile)
+def get_user(username: str, current=Depends(get_current_user_optional), db: Session = Depends(get_db)):
+    return get_user_public(db, username, current)
 
-def get_user_public(db: Session, username: str) -> schemas.UserPublic:
+def get_user_public(db: Session, username: str, current: User | None = None) -> schemas.UserProfile:
     user = db.scalars(select(User).where(User.username == username)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    followers_count = db.scalar(select(func.count()).select_from(Follow).where(Follow.following_id == user.id)) or 0
-    following_count = db.scalar(select(func.count()).select_from(Follow).where(Follow.follower_id == user.id)) or 0
-    posts_count = db.scalar(select(func.count()).select_from(Post).where(Post.author_id == user.id)) or 0
-    return schemas.UserPublic(
-        id=user.id, username=user.username, display_name=user.display_name, bio=user.bio,
-        followers_count=followers_count, following_count=following_count, posts_count=posts_count,
-    )
+    profile = schemas.UserProfile.model_validate(user)
+    if current is not None and current.id != user.id:
+        profile.is_following = is_following(db, current.id, user.id)
+    return profile
+
+@router.get("/{username}/suggestions", response_model=schemas.SuggestionsResponse)
+def suggestions(username: str, limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    # друзья друзей: на кого подписаны те, на кого подписан username
+    user_id = db.scalar(select(User.id).where(User.username == username))
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    ranked = graph.suggestions(user_id, limit)
+    users = load_users_public(db, {uid for uid, _ in ranked})
+    return schemas.SuggestionsResponse(items=[
+        schemas.UserSuggestion(user=users[uid], mutual_count=mutual) for uid, mutual in ranked if uid in users
+    ])
 
 @router.post("/{username}/follow", status_code=204)
 def follow(username: str, current=Depends(get_current_user), db: Session = Depends(get_db)):
@@ -34,10 +50,19 @@ def follow(username: str, current=Depends(get_current_user), db: Session = Depen
         raise HTTPException(status_code=404, detail="User not found")
     if target.id == current.id:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
-    exists = db.scalar(select(Follow).where(Follow.follower_id == current.id, Follow.following_id == target.id))
-    if not exists:
-        db.add(Follow(follower_id=current.id, following_id=target.id))
+    insert = dialect_insert(db)
+    followed = db.execute(
+        insert(Follow).values(follower_id=current.id, following_id=target.id)
+        .on_conflict_do_nothing().returning(Follow.follower_id)
+    ).first()
+    if followed is not None:
+        bump_user(db, current.id, following_count=1)
+        bump_user(db, target.id, followers_count=1)
+        timeline.backfill(db, current.id, target.id)
         db.commit()
+        graph.update(current.id, target.id, add=True)
+        response_cache.invalidate("feed", f"user:{current.username}", f"user:{target.username}")
+        realtime.follow_changed(current.id, target.id, following=True)
     return
 
 @router.post("/{username}/unfollow", status_code=204)
@@ -47,11 +72,15 @@ def unfollow(username: str, current=Depends(get_current_user), db: Session = Dep
         raise HTTPException(status_code=404, detail="User not found")
     if target.id == current.id:
         raise HTTPException(status_code=400, detail="Cannot unfollow yourself")
-    follow = db.scalar(select(Follow).where(Follow.follower_id == current.id, Following_id == target.id))
-    # typo guard: fix column name
-    if not follow:
-        follow = db.scalar(select(Follow).where(Follow.follower_id == current.id, Follow.following_id == target.id))
-    if follow:
-        db.delete(follow)
+    unfollowed = db.execute(
+        delete(Follow).where(Follow.follower_id == current.id, Follow.following_id == target.id).returning(Follow.follower_id)
+    ).first()
+    if unfollowed:
+        bump_user(db, current.id, following_count=-1)
+        bump_user(db, target.id, followers_count=-1)
+        timeline.prune(db, current.id, target.id)
         db.commit()
+        graph.update(current.id, target.id, add=False)
+        response_cache.invalidate("feed", f"user:{current.username}", f"user:{target.username}")
+        realtime.follow_changed(current.id, target.id, following=False)
     return
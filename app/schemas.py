@@ -27,6 +27,17 @@ class UserPublic(BaseModel):
     class Config:
         from_attributes = True
 
+class UserProfile(UserPublic):
+    # подписан ли текущий пользователь; None — аноним или свой профиль
+    is_following: Optional[bool] = None
+
+class UserSuggestion(BaseModel):
+    user: UserPublic
+    mutual_count: int
+
+class SuggestionsResponse(BaseModel):
+    items: List[UserSuggestion]
+
 class PostCreate(BaseModel):
     text: str = Field(min_length=1, max_length=280)
 
@@ -52,3 +63,12 @@ class PostPublic(BaseModel):
 class FeedResponse(BaseModel):
     items: List[PostPublic]
     next_offset: int | None = None
+    next_cursor: str | None = None
+
+class TrendingTag(BaseModel):
+    tag: str
+    score: float
+    posts: int
+
+class TrendingResponse(BaseModel):
+    items: List[TrendingTag]
@@ -0,0 +1,168 @@
+import logging
+import re
+from sqlalchemy import Connection, Engine, select, text, func, cast, literal_column, table, column
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Session
+from .config import settings
+from .database import engine
+from .models import Post
+
+log = logging.getLogger(__name__)
+
+# Полнотекстовый поиск по постам. На PostgreSQL — колонка posts.search_vector (tsvector)
+# с GIN-индексом и ts_rank, на SQLite — виртуальная таблица FTS5 с bm25.
+# Если ни то ни другое недоступно — старый ILIKE '%kw%'.
+# Индекс обновляется в той же транзакции, что и create/edit/delete поста.
+# Колонку/таблицу создаёт миграция v0005 (create_schema); на старте только проверяется,
+# что они есть, — иначе поиск работает через ILIKE.
+
+TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(keywords: list[str]) -> list[str]:
+    return [t.lower() for kw in keywords for t in TOKEN_REGEX.findall(kw)]
+
+
+class LikeSearchBackend:
+    name = "like"
+
+    @staticmethod
+    def create_schema(conn: Connection) -> None:
+        pass
+
+    @staticmethod
+    def ready(conn: Connection) -> bool:
+        return True
+
+    def index_post(self, db: Session, post_id: int, text_: str) -> None:
+        pass
+
+    def remove_post(self, db: Session, post_id: int) -> None:
+        pass
+
+    def reindex_all(self, db: Session) -> None:
+        pass
+
+    # -> (stmt, rank) ; rank=None — упорядочить можно только по времени
+    def filter(self, stmt, keywords: list[str]):
+        for kw in keywords:
+            stmt = stmt.where(Post.text.ilike(f"%{kw}%"))
+        return stmt, None
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    name = "postgres"
+    vector = literal_column("posts.search_vector")
+
+    @staticmethod
+    def create_schema(conn: Connection) -> None:
+        conn.execute(text("ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)"))
+        conn.execute(
+            text("UPDATE posts SET search_vector = to_tsvector(CAST(:config AS regconfig), text) WHERE search_vector IS NULL"),
+            {"config": settings.SEARCH_TS_CONFIG},
+        )
+
+    @staticmethod
+    def ready(conn: Connection) -> bool:
+        return bool(conn.scalar(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'posts' AND column_name = 'search_vector'"
+        )))
+
+    def index_post(self, db: Session, post_id: int, text_: str) -> None:
+        db.execute(
+            text("UPDATE posts SET search_vector = to_tsvector(CAST(:config AS regconfig), :text) WHERE id = :id"),
+            {"config": settings.SEARCH_TS_CONFIG, "text": text_, "id": post_id},
+        )
+
+    def reindex_all(self, db: Session) -> None:
+        db.execute(
+            text("UPDATE posts SET search_vector = to_tsvector(CAST(:config AS regconfig), text)"),
+            {"config": settings.SEARCH_TS_CONFIG},
+        )
+
+    def filter(self, stmt, keywords: list[str]):
+        tokens = _tokens(keywords)
+        if not tokens:
+            # одна пунктуация ("'", "?", "-"): в индексе её нет — ищем подстрокой
+            return super().filter(stmt, keywords)
+        query = func.to_tsquery(cast(settings.SEARCH_TS_CONFIG, REGCONFIG), " & ".join(f"{t}:*" for t in tokens))
+        return stmt.where(self.vector.bool_op("@@")(query)), func.ts_rank(self.vector, query)
+
+
+class SQLiteSearchBackend(LikeSearchBackend):
+    name = "sqlite-fts5"
+    fts = table("posts_fts", column("rowid"), column("posts_fts"))
+
+    @classmethod
+    def create_schema(cls, conn: Connection) -> None:
+        if not cls.ready(conn):
+            conn.execute(text("CREATE VIRTUAL TABLE posts_fts USING fts5(text, tokenize='unicode61 remove_diacritics 2')"))
+            conn.execute(text("INSERT INTO posts_fts(rowid, text) SELECT id, text FROM posts"))
+
+    @staticmethod
+    def ready(conn: Connection) -> bool:
+        return bool(conn.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'posts_fts'")))
+
+    def index_post(self, db: Session, post_id: int, text_: str) -> None:
+        self.remove_post(db, post_id)
+        db.execute(text("INSERT INTO posts_fts(rowid, text) VALUES (:id, :text)"), {"id": post_id, "text": text_})
+
+    def remove_post(self, db: Session, post_id: int) -> None:
+        db.execute(text("DELETE FROM posts_fts WHERE rowid = :id"), {"id": post_id})
+
+    def reindex_all(self, db: Session) -> None:
+        db.execute(text("DELETE FROM posts_fts"))
+        db.execute(text("INSERT INTO posts_fts(rowid, text) SELECT id, text FROM posts"))
+
+    def filter(self, stmt, keywords: list[str]):
+        tokens = _tokens(keywords)
+        if not tokens:
+            return super().filter(stmt, keywords)
+        match = " ".join(f'"{t}"*' for t in tokens)
+        hits = (
+            select(self.fts.c.rowid.label("post_id"), (-func.bm25(self.fts.c.posts_fts)).label("rank"))
+            .where(self.fts.c.posts_fts.match(match))
+            .subquery()
+        )
+        return stmt.join(hits, hits.c.post_id == Post.id), hits.c.rank
+
+
+def _sqlite_has_fts5(conn: Connection) -> bool:
+    return bool(conn.scalar(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")))
+
+
+def _dialect_backend(conn: Connection) -> type[LikeSearchBackend]:
+    if conn.dialect.name == "postgresql":
+        return PostgresSearchBackend
+    if conn.dialect.name == "sqlite" and _sqlite_has_fts5(conn):
+        return SQLiteSearchBackend
+    return LikeSearchBackend
+
+
+def create_schema(conn: Connection) -> None:
+    # из миграции: структуры создаются независимо от SEARCH_BACKEND, чтобы его можно было переключить
+    _dialect_backend(conn).create_schema(conn)
+
+
+def create_backend(bind: Engine) -> LikeSearchBackend:
+    # SEARCH_BACKEND: "auto" — по диалекту БД, "like" — принудительно ILIKE
+    if settings.SEARCH_BACKEND == "like":
+        return LikeSearchBackend()
+    with bind.connect() as conn:
+        backend = _dialect_backend(conn)
+        if backend.ready(conn):
+            return backend()
+    log.warning("search index for %s is missing (run python -m app.migrations), using LIKE", backend.name)
+    return LikeSearchBackend()
+
+
+_backend: LikeSearchBackend | None = None
+
+
+def get_backend() -> LikeSearchBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend(engine)
+    return _backend
@@ -0,0 +1,139 @@
+from sqlalchemy import Select, select, insert, update, delete, func, literal, or_, tuple_, DateTime
+from sqlalchemy.orm import Session
+from .config import settings
+from .models import User, Follow, Post, TimelineEntry
+from .pagination import apply_cursor, encode_cursor
+
+# Fan-out-on-write: при публикации id поста раскладывается в timeline_entries
+# подписчиков, и чтение /feed/following — один range scan по
+# (user_id, created_at, post_id). Авторы с очень большим числом подписчиков
+# не раскладываются — их посты подмешиваются при чтении (fan-out-on-read).
+# Такой автор помечается users.fanout_on_read и подмешивается и после того, как
+# опустится ниже порога: иначе его неразложенные посты пропали бы из лент.
+
+
+def is_fanout_author(db: Session, author_id: int) -> bool:
+    followers = db.scalar(select(User.followers_count).where(User.id == author_id)) or 0
+    return followers < settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+def trim_timelines(db: Session, user_ids) -> None:
+    ranked = (
+        select(
+            TimelineEntry.user_id, TimelineEntry.post_id,
+            func.row_number().over(
+                partition_by=TimelineEntry.user_id,
+                order_by=(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()),
+            ).label("rn"),
+        )
+        .where(TimelineEntry.user_id.in_(user_ids))
+        .subquery()
+    )
+    stale = select(ranked.c.user_id, ranked.c.post_id).where(ranked.c.rn > settings.TIMELINE_MAX_LENGTH)
+    db.execute(delete(TimelineEntry).where(tuple_(TimelineEntry.user_id, TimelineEntry.post_id).in_(stale)))
+
+
+def push_post(db: Session, post: Post) -> None:
+    if not is_fanout_author(db, post.author_id):
+        db.execute(update(User).where(User.id == post.author_id, ~User.fanout_on_read).values(fanout_on_read=True))
+        return
+    followers = select(Follow.follower_id).where(Follow.following_id == post.author_id)
+    db.execute(insert(TimelineEntry).from_select(
+        ["user_id", "post_id", "author_id", "created_at"],
+        select(
+            Follow.follower_id, literal(post.id), literal(post.author_id), literal(post.created_at, DateTime),
+        ).where(Follow.following_id == post.author_id),
+    ))
+    # обрезаем ленты не на каждой записи, а раз в TIMELINE_TRIM_EVERY постов
+    if post.id % settings.TIMELINE_TRIM_EVERY == 0:
+        trim_timelines(db, followers)
+
+
+def remove_post(db: Session, post_id: int) -> None:
+    db.execute(delete(TimelineEntry).where(TimelineEntry.post_id == post_id))
+
+
+def backfill(db: Session, follower_id: int, author_id: int) -> None:
+    if not is_fanout_author(db, author_id):
+        return
+    db.execute(delete(TimelineEntry).where(TimelineEntry.user_id == follower_id, TimelineEntry.author_id == author_id))
+    recent = (
+        select(literal(follower_id), Post.id, Post.author_id, Post.created_at)
+        .where(Post.author_id == author_id)
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(settings.TIMELINE_MAX_LENGTH)
+    )
+    db.execute(insert(TimelineEntry).from_select(["user_id", "post_id", "author_id", "created_at"], recent))
+    trim_timelines(db, [follower_id])
+
+
+def prune(db: Session, follower_id: int, author_id: int) -> None:
+    db.execute(delete(TimelineEntry).where(TimelineEntry.user_id == follower_id, TimelineEntry.author_id == author_id))
+
+
+def rebuild_timelines(db: Session) -> None:
+    # полная пересборка из follows/posts (после импорта или сидинга)
+    db.execute(delete(TimelineEntry))
+    author = User.__table__.alias("author")
+    # сразу только последние TIMELINE_MAX_LENGTH на пользователя — без вставки лишнего и trim
+    ranked = (
+        select(
+            Follow.follower_id.label("user_id"), Post.id.label("post_id"), Post.author_id, Post.created_at,
+            func.row_number().over(
+                partition_by=Follow.follower_id, order_by=(Post.created_at.desc(), Post.id.desc()),
+            ).label("rn"),
+        )
+        .join(Post, Post.author_id == Follow.following_id)
+        .join(author, author.c.id == Follow.following_id)
+        .where(author.c.followers_count < settings.TIMELINE_FANOUT_MAX_FOLLOWERS)
+        .subquery()
+    )
+    db.execute(insert(TimelineEntry).from_select(
+        ["user_id", "post_id", "author_id", "created_at"],
+        select(ranked.c.user_id, ranked.c.post_id, ranked.c.author_id, ranked.c.created_at)
+        .where(ranked.c.rn <= settings.TIMELINE_MAX_LENGTH),
+    ))
+
+
+def mark_fanout_on_read(db: Session) -> None:
+    # после rebuild_timelines: в ленты попали посты только «лёгких» сейчас авторов
+    db.execute(update(User).values(fanout_on_read=User.followers_count >= settings.TIMELINE_FANOUT_MAX_FOLLOWERS))
+
+
+def _fanout_on_read_authors(db: Session, user_id: int):
+    # «тяжёлые» сейчас и бывшие «тяжёлые», чьи посты в ленты не попали
+    return (
+        select(Follow.following_id)
+        .join(User, User.id == Follow.following_id)
+        .where(Follow.follower_id == user_id,
+               or_(User.followers_count >= settings.TIMELINE_FANOUT_MAX_FOLLOWERS, User.fanout_on_read))
+    )
+
+
+def home_timeline_stmt(user_id: int, cursor: str | None = None) -> Select:
+    # сохранённая часть ленты; тот же запрос проверяет python -m app.migrations check
+    return apply_cursor(
+        select(Post).join(TimelineEntry, TimelineEntry.post_id == Post.id).where(TimelineEntry.user_id == user_id),
+        cursor, TimelineEntry.created_at, TimelineEntry.post_id,
+    )
+
+
+def read_home_timeline(db: Session, user_id: int, limit: int, cursor: str | None = None):
+    items = list(db.scalars(home_timeline_stmt(user_id, cursor).limit(limit)).all())
+
+    heavy = list(db.scalars(
+        apply_cursor(select(Post).where(Post.author_id.in_(_fanout_on_read_authors(db, user_id))), cursor).limit(limit)
+    ).all())
+    if heavy:
+        merged = {p.id: p for p in items + heavy}
+        items = sorted(merged.values(), key=lambda p: (p.created_at, p.id), reverse=True)[:limit]
+
+    # лента обрезана до TIMELINE_MAX_LENGTH (или ещё не заполнена) — добираем старое чтением
+    if len(items) < limit:
+        after = encode_cursor(items[-1].created_at, items[-1].id) if items else cursor
+        subq = select(Follow.following_id).where(Follow.follower_id == user_id)
+        older = apply_cursor(select(Post).where(Post.author_id.in_(subq)), after)
+        items += db.scalars(older.limit(limit - len(items))).all()
+
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if len(items) == limit else None
+    return items, next_cursor
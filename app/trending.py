@@ -0,0 +1,117 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+from . import schemas
+from .config import settings
+from .database import SessionLocal, dialect_insert
+from .models import Hashtag, HashtagBucket, Post, PostHashtag
+
+# Тренды считаются не GROUP BY по post_hashtags, а по маленькой таблице
+# hashtag_buckets (тег × интервал времени), которую инкрементально обновляет
+# hashtags.set_post_hashtags. Поверх неё в памяти держится top-K на каждый
+# режим/окно и пересчитывается не чаще раза в TRENDING_REFRESH_SECONDS.
+
+PRUNE_EVERY_SECONDS = 3600
+
+
+def bucket_of(at: datetime) -> datetime:
+    size = settings.TRENDING_BUCKET_SECONDS
+    epoch = datetime(1970, 1, 1)
+    return epoch + timedelta(seconds=int((at - epoch).total_seconds()) // size * size)
+
+
+def record(db: Session, deltas: dict[int, int], at: datetime) -> None:
+    deltas = {h: d for h, d in deltas.items() if d}
+    if not deltas:
+        return
+    bucket = bucket_of(at)
+    insert = dialect_insert(db)
+    stmt = insert(HashtagBucket).values([
+        {"hashtag_id": h, "bucket_start": bucket, "count": d} for h, d in deltas.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["hashtag_id", "bucket_start"],
+        set_={"count": HashtagBucket.count + stmt.excluded.count},
+    ))
+
+
+def compute(db: Session, mode: str, window_hours: int, now: datetime | None = None) -> list[schemas.TrendingTag]:
+    now = now or datetime.utcnow()
+    hours = window_hours if mode == "window" else settings.TRENDING_HORIZON_HOURS
+    rows = db.execute(
+        select(Hashtag.tag, HashtagBucket.bucket_start, HashtagBucket.count)
+        .join(Hashtag, Hashtag.id == HashtagBucket.hashtag_id)
+        .where(HashtagBucket.bucket_start >= bucket_of(now - timedelta(hours=hours)), HashtagBucket.count > 0)
+    ).all()
+    scores: dict[str, float] = defaultdict(float)
+    posts: dict[str, int] = defaultdict(int)
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    for tag, bucket_start, count in rows:
+        if mode == "decay":
+            # возраст считаем от середины бакета
+            age = (now - bucket_start).total_seconds() - settings.TRENDING_BUCKET_SECONDS / 2
+            scores[tag] += count * math.pow(0.5, max(age, 0) / half_life)
+        else:
+            scores[tag] += count
+        posts[tag] += count
+    top = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:settings.TRENDING_TOP_K]
+    return [schemas.TrendingTag(tag=tag, score=round(score, 4), posts=posts[tag]) for tag, score in top]
+
+
+def prune(db: Session, now: datetime | None = None) -> None:
+    cutoff = bucket_of((now or datetime.utcnow()) - timedelta(hours=settings.TRENDING_HORIZON_HOURS))
+    db.execute(delete(HashtagBucket).where(HashtagBucket.bucket_start < cutoff))
+
+
+def rebuild(db: Session) -> None:
+    # полная пересборка бакетов из post_hashtags (после импорта или сидинга)
+    counts: dict[tuple[int, datetime], int] = defaultdict(int)
+    rows = db.execute(
+        select(PostHashtag.hashtag_id, Post.created_at).join(Post, Post.id == PostHashtag.post_id)
+        .where(Post.created_at >= datetime.utcnow() - timedelta(hours=settings.TRENDING_HORIZON_HOURS))
+        .execution_options(yield_per=10000)
+    )
+    for hashtag_id, created_at in rows:
+        counts[(hashtag_id, bucket_of(created_at))] += 1
+    db.execute(delete(HashtagBucket))
+    if counts:
+        db.execute(HashtagBucket.__table__.insert(), [
+            {"hashtag_id": h, "bucket_start": b, "count": n} for (h, b), n in counts.items()
+        ])
+
+
+class TopKCache:
+    def __init__(self):
+        self._entries: dict[tuple[str, int], tuple[float, list[schemas.TrendingTag]]] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def get(self, mode: str, window_hours: int, limit: int) -> list[schemas.TrendingTag]:
+        key = (mode, window_hours)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > settings.TRENDING_REFRESH_SECONDS:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None or time.monotonic() - entry[0] > settings.TRENDING_REFRESH_SECONDS:
+                    entry = (time.monotonic(), self._refresh(mode, window_hours))
+                    self._entries[key] = entry
+        return entry[1][:limit]
+
+    def _refresh(self, mode: str, window_hours: int) -> list[schemas.TrendingTag]:
+        with SessionLocal() as db:
+            if time.monotonic() - self._last_prune > PRUNE_EVERY_SECONDS:
+                prune(db)
+                db.commit()
+                self._last_prune = time.monotonic()
+            return compute(db, mode, window_hours)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+top_k = TopKCache()
@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import time
+from .config import settings
+from . import passwords
+
+log = logging.getLogger(__name__)
+
+# Прогрев перед первым запросом. Первый запрос к ручке платит за компиляцию SQL
+# (кэш SQLAlchemy), соединение с БД, сборку middleware и загрузку bcrypt — на ленте
+# это ~20 мс сверх обычного. Прогрев прогоняет несколько GET из WARMUP_PATHS прямо
+# через ASGI-приложение, без сети.
+# С gunicorn --preload (gunicorn.conf.py) прогрев идёт один раз в мастере до fork,
+# и воркеры наследуют тёплые кэши; без preload — в startup каждого воркера
+# (WARMUP_ON_STARTUP). Пути — только синхронные ручки: async-движок привязан к
+# event loop и в мастере создаваться не должен.
+
+
+async def request(app, path: str) -> int:
+    # один GET через ASGI; -> статус ответа
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"warmup")], "client": ("127.0.0.1", 0), "server": ("warmup", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def warm(app) -> None:
+    started = time.perf_counter()
+    passwords.warm()
+    for path in filter(None, (p.strip() for p in settings.WARMUP_PATHS.split(","))):
+        try:
+            status = await request(app, path)
+        except Exception:
+            log.exception("warmup request %s failed", path)
+            continue
+        if status >= 500:
+            log.warning("warmup request %s -> %s", path, status)
+    log.info("warmup done in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+def warm_sync(app) -> None:
+    # вне event loop (мастер gunicorn)
+    asyncio.run(warm(app))
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# python -m bench seed --users 1000 --posts 20000
+# python -m bench run --duration 5 --concurrency 16 --save bench/baselines/local.json
+# python -m bench run --compare bench/baselines/local.json
+# python -m bench serialize --limit 100
+# python -m bench coldstart --runs 5 --importtime 15
+
+
+def _compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    problems = []
+    for name, current in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if base[metric] and current[metric] > base[metric] * (1 + max_regression):
+                problems.append(f"{name}: {metric} {base[metric]} -> {current[metric]}")
+        if "queries_per_request" in base and current.get("queries_per_request", 0) > base["queries_per_request"]:
+            problems.append(f"{name}: queries/request {base['queries_per_request']} -> {current['queries_per_request']}")
+    return problems
+
+
+def _print_table(results: dict) -> None:
+    header = f"{'endpoint':<18}{'req':>8}{'err':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<18}{r['requests']:>8}{r['errors']:>6}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r.get('queries_per_request', '-'):>8}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument("--db", default=os.getenv("BENCH_DATABASE_URL", "sqlite:///./bench.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="пересоздать БД и заполнить синтетическими данными")
+    p_seed.add_argument("--users", type=int, default=1000)
+    p_seed.add_argument("--posts", type=int, default=20000)
+    p_seed.add_argument("--follows-per-user", type=int, default=30)
+    p_seed.add_argument("--likes", type=int, default=50000)
+    p_seed.add_argument("--tags", type=int, default=200)
+    p_seed.add_argument("--days", type=int, default=7)
+    p_seed.add_argument("--seed", type=int, default=42)
+
+    p_run = sub.add_parser("run", help="нагрузочный прогон")
+    p_run.add_argument("--scenarios", default="feed_public,feed_public_anon,feed_following,search,post,like,login")
+    p_run.add_argument("--users", type=int, default=1000)
+    p_run.add_argument("--posts", type=int, default=20000)
+    p_run.add_argument("--concurrency", type=int, default=16)
+    p_run.add_argument("--duration", type=float, default=5.0, help="секунд на сценарий")
+    p_run.add_argument("--url", default=None, help="гонять живой сервер вместо in-process приложения")
+    p_run.add_argument("--save", default=None, help="сохранить результаты как baseline (json)")
+    p_run.add_argument("--compare", default=None, help="сравнить с baseline и вернуть 1 при регрессии")
+    p_run.add_argument("--max-regression", type=float, default=0.2)
+
+    p_ser = sub.add_parser("serialize", help="CPU на страницу ленты: Pydantic против быстрого пути (FAST_JSON_ENABLED)")
+    p_ser.add_argument("--limit", type=int, default=100)
+    p_ser.add_argument("--rounds", type=int, default=200)
+    p_ser.add_argument("--viewer", type=int, default=1, help="id пользователя для liked_by_me/reposted_by_me (0 — аноним)")
+
+    p_cold = sub.add_parser("coldstart", help="импорт, startup и первый запрос воркера: без preload и с preload")
+    p_cold.add_argument("--runs", type=int, default=5)
+    p_cold.add_argument("--paths", default="/feed/public?limit=20,/posts?limit=20,/search?q=hello,/search?q=%23tag1")
+    p_cold.add_argument("--importtime", type=int, default=0, help="показать N самых дорогих по импорту модулей")
+
+    args = parser.parse_args()
+    # настройки приложения читаются при импорте app.*, поэтому БД выставляем до него
+    os.environ["DATABASE_URL"] = args.db
+    # все виртуальные клиенты приходят с одного адреса — лимиты замерили бы сами себя
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    if args.command == "seed":
+        from .seed import seed
+        stats = seed(args.users, args.posts, args.follows_per_user, args.likes, args.tags, args.days, args.seed)
+        print(json.dumps(stats, indent=2))
+        return 0
+
+    if args.command == "serialize":
+        from .serialization import run as run_serialization
+        stats = run_serialization(args.limit, args.rounds, args.viewer or None)
+        print(json.dumps(stats, indent=2))
+        return 0 if stats["identical"] else 1
+
+    if args.command == "coldstart":
+        from .coldstart import run as run_coldstart, importtime
+        if args.importtime:
+            for name, ms in importtime(args.importtime):
+                print(f"{name:<40}{ms:>9} ms")
+        stats = run_coldstart(args.runs, [p.strip() for p in args.paths.split(",") if p.strip()])
+        print(json.dumps(stats, indent=2))
+        return 0
+
+    from .loadgen import run
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    results = asyncio.run(run(scenarios, args.users, args.posts, args.concurrency, args.duration, url=args.url))
+    _print_table(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"db": args.db, "concurrency": args.concurrency, "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            problems = _compare(results, json.load(f), args.max_regression)
+        for line in problems:
+            print("REGRESSION", line)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
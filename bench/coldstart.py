@@ -0,0 +1,103 @@
+import asyncio
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Холодный старт воркера: сколько стоит импорт приложения, startup и первый запрос
+# к каждой ручке по сравнению со вторым. Каждый прогон — свежий процесс:
+#   cold    — как воркер без preload: импорт + startup в самом воркере;
+#   preload — как gunicorn.conf.py: импорт, миграции и прогрев в «мастере», воркер — fork.
+# --importtime — самые дорогие модули по python -X importtime.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+async def _serve(app, paths: list[str], started: float) -> dict:
+    from app import warmup
+    await app.router.startup()
+    result = {"worker_start_ms": _ms(time.perf_counter() - started), "first_ms": {}, "second_ms": {}}
+    for key in ("first_ms", "second_ms"):
+        for path in paths:
+            t = time.perf_counter()
+            await warmup.request(app, path)
+            result[key][path] = _ms(time.perf_counter() - t)
+    await app.router.shutdown()
+    return result
+
+
+def _child(mode: str, paths: list[str]) -> None:
+    # запускается в отдельном процессе: python -m bench.coldstart <mode> <paths>
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    if mode == "cold":
+        result = asyncio.run(_serve(app, paths, started))
+        result["import_ms"] = _ms(imported - started)
+        print(json.dumps(result), flush=True)
+        return
+
+    # то же, что when_ready в gunicorn.conf.py
+    from app import migrations, warmup
+    from app.config import settings
+    from app.database import engine, replica_engine
+    migrations.upgrade(engine)
+    warmup.warm_sync(app)
+    engine.dispose()
+    replica_engine.dispose()
+    settings.MIGRATE_ON_STARTUP = False
+    settings.WARMUP_ON_STARTUP = False
+    gc.freeze()
+    master_ms = _ms(time.perf_counter() - started)
+    pid = os.fork()
+    if pid == 0:
+        result = asyncio.run(_serve(app, paths, time.perf_counter()))
+        result["import_ms"] = 0.0
+        result["master_ms"] = master_ms
+        print(json.dumps(result), flush=True)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def importtime(top: int) -> list[tuple[str, float]]:
+    # -> [(модуль, собственное время мс)]; сторонние пакеты суммируются по верхнему уровню
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    totals: dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if not self_us.strip().isdigit():
+            continue
+        key = name if name.startswith("app.") else name.split(".")[0]
+        totals[key] = totals.get(key, 0.0) + int(self_us) / 1000
+    return sorted(((k, round(v, 1)) for k, v in totals.items()), key=lambda kv: -kv[1])[:top]
+
+
+def run(runs: int, paths: list[str]) -> dict:
+    results = {}
+    for mode in ("cold", "preload"):
+        samples = []
+        for _ in range(runs):
+            proc = subprocess.run([sys.executable, "-m", "bench.coldstart", mode, ",".join(paths)],
+                                  cwd=ROOT, capture_output=True, text=True, check=True)
+            samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        summary = {key: statistics.median(s[key] for s in samples)
+                   for key in ("import_ms", "worker_start_ms", "master_ms") if key in samples[0]}
+        for key in ("first_ms", "second_ms"):
+            summary[key] = {p: statistics.median(s[key][p] for s in samples) for p in paths}
+        results[mode] = summary
+    return results
+
+
+if __name__ == "__main__":
+    _child(sys.argv[1], sys.argv[2].split(","))
@@ -0,0 +1,161 @@
+import asyncio
+import random
+import time
+from sqlalchemy import event
+from app.database import engine, get_async_sessionmaker
+
+# Нагрузочный прогон через само FastAPI-приложение (httpx + ASGITransport, без сети)
+# или по --url против запущенного сервера. Каждый сценарий крутится отдельно
+# на N конкурентных клиентах; потом отдельным последовательным проходом
+# считается число SQL-запросов на запрос (только в in-process режиме).
+
+BENCH_PASSWORD = "benchpass"
+WORDS = ["coffee", "music", "city", "python", "погода", "travel", "#tag0", "#tag1", "#tag3 #tag7"]
+
+
+class Context:
+    def __init__(self, users: int, posts: int, tokens: list[dict], rnd: random.Random):
+        self.users = users
+        self.posts = posts
+        self.tokens = tokens
+        self.rnd = rnd
+
+    def auth(self) -> dict:
+        return self.rnd.choice(self.tokens)
+
+    def post_id(self) -> int:
+        return self.rnd.randint(1, self.posts)
+
+
+async def _feed_public(client, ctx):
+    return await client.get("/feed/public", params={"limit": 20}, headers=ctx.auth())
+
+
+async def _feed_public_anon(client, ctx):
+    return await client.get("/feed/public", params={"limit": 20})
+
+
+async def _feed_following(client, ctx):
+    return await client.get("/feed/following", params={"limit": 20}, headers=ctx.auth())
+
+
+async def _search(client, ctx):
+    return await client.get("/search", params={"q": ctx.rnd.choice(WORDS), "limit": 20}, headers=ctx.auth())
+
+
+async def _post(client, ctx):
+    return await client.get(f"/posts/{ctx.post_id()}", headers=ctx.auth())
+
+
+async def _like(client, ctx):
+    post_id, headers = ctx.post_id(), ctx.auth()
+    if ctx.rnd.random() < 0.5:
+        return await client.post(f"/posts/{post_id}/like", headers=headers)
+    return await client.delete(f"/posts/{post_id}/like", headers=headers)
+
+
+async def _login(client, ctx):
+    username = f"user{ctx.rnd.randint(1, ctx.users)}"
+    return await client.post("/auth/login", data={"username": username, "password": BENCH_PASSWORD})
+
+
+SCENARIOS = {
+    "feed_public": _feed_public,
+    "feed_public_anon": _feed_public_anon,
+    "feed_following": _feed_following,
+    "search": _search,
+    "post": _post,
+    "like": _like,
+    "login": _login,
+}
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+async def _run_scenario(client, ctx, fn, concurrency: int, duration: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await fn(client, ctx)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+async def _queries_per_request(client, ctx, fn, samples: int) -> float:
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    # /auth ходит через async-движок — считаем и его
+    engines = [engine, get_async_sessionmaker().kw["bind"].sync_engine]
+    for e in engines:
+        event.listen(e, "before_cursor_execute", count)
+    try:
+        for _ in range(samples):
+            await fn(client, ctx)
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", count)
+    return round(counter[0] / samples, 2)
+
+
+async def run(scenarios: list[str], users: int, posts: int, concurrency: int, duration: float,
+              url: str | None = None, token_pool: int = 20, samples: int = 20, seed_value: int = 1) -> dict:
+    import httpx
+
+    rnd = random.Random(seed_value)
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=30)
+        app = None
+    else:
+        from app.main import app
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=30)
+
+    results = {}
+    try:
+        tokens = []
+        for i in rnd.sample(range(1, users + 1), min(token_pool, users)):
+            r = await client.post("/auth/login", data={"username": f"user{i}", "password": BENCH_PASSWORD})
+            r.raise_for_status()
+            tokens.append({"Authorization": "Bearer " + r.json()["access_token"]})
+        ctx = Context(users, posts, tokens, rnd)
+
+        for name in scenarios:
+            fn = SCENARIOS[name]
+            for _ in range(3):
+                await fn(client, ctx)  # прогрев
+            result = await _run_scenario(client, ctx, fn, concurrency, duration)
+            if app is not None:
+                result["queries_per_request"] = await _queries_per_request(client, ctx, fn, samples)
+            results[name] = result
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+    return results
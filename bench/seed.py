@@ -0,0 +1,106 @@
+import random
+from itertools import accumulate
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.database import engine, SessionLocal
+from app.models import Base, User, Post, Follow, Like, Hashtag, PostHashtag
+from app.passwords import hash_sync
+from app.counters import recount_all
+from app.search_index import get_backend as get_search_backend
+from app import timeline, trending, migrations
+
+# Синтетический соцграф для бенчмарков: подписки и активность распределены
+# по степенному закону (немного «звёзд» и длинный хвост), пароль у всех
+# один — BENCH_PASSWORD, хэшируется один раз.
+
+BENCH_PASSWORD = "benchpass"
+WORDS = (
+    "alpha beta gamma delta river mountain coffee morning city night music code python "
+    "football weather travel book movie game photo cat dog summer winter market news "
+    "сегодня завтра город кофе музыка погода работа друзья"
+).split()
+CHUNK = 5000
+
+
+# накопленные веса: random.choices(cum_weights=...) не пересчитывает их на каждый вызов
+def _zipf_weights(n: int, s: float) -> list[float]:
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _insert(db, table, rows) -> None:
+    for i in range(0, len(rows), CHUNK):
+        db.execute(table.insert(), rows[i:i + CHUNK])
+
+
+def seed(users: int, posts: int, follows_per_user: int, likes: int, tags: int, days: int, seed_value: int) -> dict:
+    rnd = random.Random(seed_value)
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("DROP TABLE IF EXISTS posts_fts"))
+    Base.metadata.drop_all(bind=engine)
+    migrations.metadata.drop_all(bind=engine)
+    migrations.upgrade(engine)
+
+    now = datetime.utcnow()
+    hashed = hash_sync(BENCH_PASSWORD)
+    popularity = _zipf_weights(users, 1.1)
+    user_ids = list(range(1, users + 1))
+
+    with SessionLocal() as db:
+        _insert(db, User.__table__, [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@bench.local", "hashed_password": hashed,
+             "created_at": now - timedelta(days=days), "followers_count": 0, "following_count": 0, "posts_count": 0}
+            for i in user_ids
+        ])
+
+        follow_rows = []
+        for follower in user_ids:
+            # сколько на кого подписан — тоже тяжёлый хвост
+            n = min(users - 1, max(1, int(rnd.paretovariate(1.5) * follows_per_user / 3)))
+            targets = {t for t in rnd.choices(user_ids, cum_weights=popularity, k=n) if t != follower}
+            follow_rows += [{"follower_id": follower, "following_id": t, "created_at": now} for t in targets]
+        _insert(db, Follow.__table__, follow_rows)
+
+        tag_names = [f"tag{i}" for i in range(tags)]
+        tag_weights = _zipf_weights(tags, 1.2)
+        _insert(db, Hashtag.__table__, [{"id": i + 1, "tag": t} for i, t in enumerate(tag_names)])
+
+        post_rows, post_tag_rows = [], []
+        span = days * 86400
+        for pid in range(1, posts + 1):
+            author = rnd.choices(user_ids, cum_weights=popularity)[0]
+            post_tags = set(rnd.choices(range(tags), cum_weights=tag_weights, k=rnd.randint(0, 3))) if tags else set()
+            words = rnd.choices(WORDS, k=rnd.randint(4, 20)) + [f"#{tag_names[t]}" for t in post_tags]
+            post_rows.append({
+                "id": pid, "author_id": author, "text": " ".join(words)[:280],
+                "created_at": now - timedelta(seconds=rnd.randint(0, span)),
+                "edited": False, "likes_count": 0, "reposts_count": 0,
+            })
+            post_tag_rows += [{"post_id": pid, "hashtag_id": t + 1} for t in post_tags]
+        _insert(db, Post.__table__, post_rows)
+        _insert(db, PostHashtag.__table__, post_tag_rows)
+
+        post_weights = _zipf_weights(posts, 0.9)
+        post_order = list(range(1, posts + 1))
+        rnd.shuffle(post_order)
+        like_pairs = set()
+        for _ in range(likes):
+            like_pairs.add((rnd.choice(user_ids), rnd.choices(post_order, cum_weights=post_weights)[0]))
+        _insert(db, Like.__table__, [{"user_id": u, "post_id": p, "created_at": now} for u, p in like_pairs])
+
+        if engine.dialect.name == "postgresql":
+            for table in ("users", "posts", "hashtags"):
+                db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"))
+
+        recount_all(db)
+        timeline.rebuild_timelines(db)
+        timeline.mark_fanout_on_read(db)
+        trending.rebuild(db)
+        db.commit()
+
+    with SessionLocal() as db:
+        get_search_backend().reindex_all(db)
+        db.commit()
+
+    return {"users": users, "follows": len(follow_rows), "posts": posts, "likes": len(like_pairs),
+            "hashtags": tags, "post_hashtags": len(post_tag_rows)}
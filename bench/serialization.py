@@ -0,0 +1,68 @@
+import asyncio
+import time
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import select
+from app import schemas
+from app.database import SessionLocal
+from app.fast_feed import POST_COLUMNS, hydrate_feed, dumps
+from app.hydration import hydrate_posts
+from app.instrumentation import TimedJSONResponse
+from app.models import Post, User
+from app.pagination import paginate
+
+# CPU на одну страницу ленты: обычный путь (ORM -> PostPublic -> response_model ->
+# JSONResponse) против быстрого (строки -> dict -> orjson). Оба пути гоняются на
+# одних и тех же данных; заодно проверяется, что байты ответа совпадают.
+
+_field = create_model_field("Response_feed", schemas.FeedResponse, mode="serialization")
+
+
+def _pydantic_page(db, loop, limit: int, viewer) -> bytes:
+    items, next_offset, next_cursor = paginate(db, select(Post), limit)
+    model = schemas.FeedResponse(items=hydrate_posts(db, items, viewer), next_offset=next_offset, next_cursor=next_cursor)
+    # то же, что делает FastAPI с возвращённой моделью при response_model=FeedResponse
+    content = loop.run_until_complete(serialize_response(field=_field, response_content=model))
+    return TimedJSONResponse(content).body
+
+
+def _fast_page(db, loop, limit: int, viewer) -> bytes:
+    items, next_offset, next_cursor = paginate(db, select(Post), limit, columns=POST_COLUMNS)
+    return dumps({"items": hydrate_feed(db, items, viewer), "next_offset": next_offset, "next_cursor": next_cursor})
+
+
+def _measure(page, loop, limit: int, rounds: int, viewer_id: int | None) -> tuple[float, float, bytes]:
+    body = b""
+    cpu = wall = 0.0
+    for _ in range(rounds):
+        with SessionLocal() as db:
+            viewer = db.get(User, viewer_id) if viewer_id else None
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            body = page(db, loop, limit, viewer)
+            cpu += time.process_time() - cpu_started
+            wall += time.perf_counter() - wall_started
+    return cpu / rounds * 1000, wall / rounds * 1000, body
+
+
+def run(limit: int, rounds: int, viewer_id: int | None = 1) -> dict:
+    loop = asyncio.new_event_loop()
+    try:
+        # прогрев: кэш скомпилированных запросов, импорт orjson и т.п.
+        _measure(_pydantic_page, loop, limit, 3, viewer_id)
+        _measure(_fast_page, loop, limit, 3, viewer_id)
+        slow_cpu, slow_wall, slow_body = _measure(_pydantic_page, loop, limit, rounds, viewer_id)
+        fast_cpu, fast_wall, fast_body = _measure(_fast_page, loop, limit, rounds, viewer_id)
+    finally:
+        loop.close()
+    return {
+        "limit": limit,
+        "rounds": rounds,
+        "pydantic_cpu_ms": round(slow_cpu, 3),
+        "pydantic_wall_ms": round(slow_wall, 3),
+        "fast_cpu_ms": round(fast_cpu, 3),
+        "fast_wall_ms": round(fast_wall, 3),
+        "cpu_saved_ms": round(slow_cpu - fast_cpu, 3),
+        "cpu_saved_pct": round((1 - fast_cpu / slow_cpu) * 100, 1) if slow_cpu else 0.0,
+        "identical": slow_body == fast_body,
+        "bytes": len(fast_body),
+    }
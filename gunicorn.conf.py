@@ -0,0 +1,50 @@
+import gc
+import os
+
+# gunicorn -c gunicorn.conf.py app.main:app
+#
+# С preload (GUNICORN_PRELOAD, по умолчанию включён) приложение один раз импортируется,
+# мигрирует БД и прогревается в мастере, а воркеры получают готовый процесс через fork:
+# новый воркер не тратит секунду на импорт FastAPI/Pydantic/SQLAlchemy и отвечает на
+# первый запрос с тёплыми кэшами. Соединения с БД из мастера воркерам не достаются
+# (dispose до и после fork), фоновые потоки (counter-flush, realtime) стартуют в startup
+# уже внутри воркера. Минус preload: код при HUP не перечитывается — нужен рестарт.
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+
+def _engines():
+    from app.database import engine, replica_engine
+    return [engine] if replica_engine is engine else [engine, replica_engine]
+
+
+def when_ready(server):
+    # мастер, до запуска воркеров; без preload приложения в мастере нет
+    if not preload_app:
+        return
+    from app.main import app
+    from app import migrations, warmup
+    from app.config import settings
+    from app.database import engine
+    from app.search_index import get_backend
+    migrations.upgrade(engine)
+    get_backend()
+    warmup.warm_sync(app)
+    for e in _engines():
+        e.dispose()
+    # воркеры не повторяют то, что сделано в мастере
+    settings.MIGRATE_ON_STARTUP = False
+    settings.WARMUP_ON_STARTUP = False
+    # объекты мастера — в постоянное поколение: сборщик мусора в воркерах не трогает
+    # их счётчики и не копирует страницы памяти, общие после fork
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        # пул мог унаследовать соединения мастера: забыть их, не закрывая чужие сокеты
+        for e in _engines():
+            e.dispose(close=False)
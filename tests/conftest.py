@@ -0,0 +1,32 @@
+import itertools
+import os
+import tempfile
+
+# одна временная SQLite-база на весь прогон; настройки читаются при импорте app
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+_names = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # startup накатывает миграции
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def make_user(client):
+    # -> (username, заголовки с токеном)
+    def create(prefix: str = "user") -> tuple[str, dict]:
+        username = f"{prefix}{next(_names)}"
+        password = "secret123"
+        assert client.post("/auth/signup", json={"username": username, "password": password}).status_code == 201
+        token = client.post("/auth/login", data={"username": username, "password": password}).json()["access_token"]
+        return username, {"Authorization": f"Bearer {token}"}
+    return create
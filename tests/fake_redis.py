@@ -0,0 +1,101 @@
+import fnmatch
+import queue
+import threading
+import time
+
+# Redis в памяти для тестов: строки с EXPIRE, PUBLISH/PSUBSCRIBE и то подмножество
+# команд, которым пользуются redis-бэкенды приложения. Значения, как и в redis-py,
+# возвращаются байтами. Один FakeRedis на несколько брокеров — как общий Redis у воркеров.
+
+
+class FakePubSub:
+    def __init__(self, server: "FakeRedis"):
+        self.server = server
+        self.patterns: list[str] = []
+        self.messages: queue.Queue = queue.Queue()
+
+    def psubscribe(self, *patterns: str) -> None:
+        with self.server.lock:
+            self.patterns.extend(patterns)
+            self.server.pubsubs.append(self)
+
+    def get_message(self, timeout: float = 0.0) -> dict | None:
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        with self.server.lock:
+            if self in self.server.pubsubs:
+                self.server.pubsubs.remove(self)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+        self.expires: dict[str, float] = {}
+        self.pubsubs: list[FakePubSub] = []
+        self.lock = threading.Lock()
+
+    def _alive(self, key: str) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key: str) -> bytes | None:
+        return self.data[key] if self._alive(key) else None
+
+    def mget(self, keys: list[str]) -> list[bytes | None]:
+        return [self.get(key) for key in keys]
+
+    def set(self, key: str, value, ex: int | None = None, nx: bool = False) -> bool | None:
+        if nx and self._alive(key):
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        self.expires.pop(key, None)
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        return True
+
+    def incr(self, key: str) -> int:
+        value = int(self.get(key) or 0) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    def ttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else int(deadline - time.monotonic())
+
+    def delete(self, *keys: str) -> int:
+        removed = sum(self._alive(key) for key in keys)
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> FakePubSub:
+        return FakePubSub(self)
+
+    def publish(self, channel: str, data) -> int:
+        payload = data if isinstance(data, bytes) else str(data).encode()
+        with self.lock:
+            receivers = 0
+            for pubsub in self.pubsubs:
+                for pattern in pubsub.patterns:
+                    if fnmatch.fnmatchcase(channel, pattern):
+                        pubsub.messages.put({"type": "pmessage", "pattern": pattern.encode(),
+                                             "channel": channel.encode(), "data": payload})
+                        receivers += 1
+                        break
+        return receivers
@@ -0,0 +1,92 @@
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from jose import jwt as jose_jwt
+from sqlalchemy import event
+from app import cache
+from app.auth import _resolve_user, _user_cache, create_access_token, get_password_hash
+from app.database import SessionLocal, engine
+from app.models import User
+
+
+@pytest.fixture
+def advance(monkeypatch):
+    # сдвиг часов для TTL-кэшей (time.monotonic в app.cache) и проверки exp в jose
+    def shift(seconds: float) -> None:
+        monotonic = time.monotonic
+        monkeypatch.setattr(cache, "time", SimpleNamespace(monotonic=lambda: monotonic() + seconds))
+
+        class ShiftedDatetime(datetime):
+            @classmethod
+            def utcnow(cls):
+                return datetime.utcnow() + timedelta(seconds=seconds)
+
+        monkeypatch.setattr(jose_jwt, "datetime", ShiftedDatetime)
+    return shift
+
+
+@pytest.fixture
+def queries():
+    # SQL-запросы, выполненные внутри with-блока
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def _create_user(username: str) -> int:
+    with SessionLocal() as db:
+        user = User(username=username, email=f"{username}@x.io", hashed_password=get_password_hash("secret1"))
+        db.add(user)
+        db.commit()
+        return user.id
+
+
+def test_expired_legacy_token_is_rejected(client, advance):
+    # токен без uid (выпущенный до TOKEN_INCLUDE_USER_ID) не должен жить в кэше дольше своего exp
+    _create_user("legacy")
+    token = create_access_token("legacy", expires_delta=timedelta(seconds=10))
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/users/me", headers=headers).status_code == 200
+    assert client.get("/users/me", headers=headers).status_code == 200
+    advance(11)
+    assert client.get("/users/me", headers=headers).status_code == 401
+
+
+def test_cached_token_skips_db(queries):
+    user_id = _create_user("cachedtoken")
+    token = create_access_token("cachedtoken", user_id=user_id)
+    with SessionLocal() as db:
+        assert _resolve_user(db, token).id == user_id
+        queries.clear()
+        assert _resolve_user(db, token).id == user_id
+    assert queries == []
+
+
+def test_cached_user_is_invalidated_on_change():
+    user_id = _create_user("changing")
+    token = create_access_token("changing", user_id=user_id)
+    with SessionLocal() as db:
+        assert _resolve_user(db, token).hashed_password
+        assert _user_cache.get(user_id) is not None
+
+    # смена пароля через ORM сбрасывает закэшированную строку
+    new_hash = get_password_hash("secret2")
+    with SessionLocal() as db:
+        db.get(User, user_id).hashed_password = new_hash
+        db.commit()
+    assert _user_cache.get(user_id) is None
+    with SessionLocal() as db:
+        assert _resolve_user(db, token).hashed_password == new_hash
+
+    # переименование — старый токен (sub) больше не подходит
+    with SessionLocal() as db:
+        db.get(User, user_id).username = "renamed"
+        db.commit()
+    with SessionLocal() as db:
+        assert _resolve_user(db, token) is None
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def post_path(client, make_user):
+    # тело заметно больше COMPRESSION_MIN_SIZE
+    username, headers = make_user("compressor")
+    for _ in range(5):
+        assert client.post("/posts", json={"text": "long " * 50}, headers=headers).status_code == 201
+    return f"/posts?author={username}"
+
+
+def test_compressed_representation_has_its_own_etag(client, post_path):
+    identity = client.get(post_path, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(post_path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in identity.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.content == identity.content
+    assert gzipped.headers["etag"] == identity.headers["etag"][:-1] + '-gzip"'
+
+
+def test_not_modified_with_gzip(client, post_path):
+    etag = client.get(post_path, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        response = client.get(post_path, headers={"Accept-Encoding": "gzip", "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    assert client.get(post_path, headers={"Accept-Encoding": "gzip", "If-None-Match": '"other-gzip"'}).status_code == 200
@@ -0,0 +1,14 @@
+import os
+import tempfile
+from sqlalchemy import create_engine
+from app import migrations
+from app.migrations import explain
+
+
+def test_hot_queries_use_their_indexes():
+    engine = create_engine("sqlite:///" + os.path.join(tempfile.mkdtemp(), "migrate.db"))
+    assert migrations.upgrade(engine) == [name for name, _ in migrations.available()]
+    assert migrations.pending(engine) == []
+    failed = [(name, index, plan) for name, index, ok, plan in explain.check(engine) if not ok]
+    assert failed == []
+    engine.dispose()
@@ -0,0 +1,56 @@
+import time
+import pytest
+from app import postings, realtime
+from app.config import settings
+from app.realtime import RedisBroker
+from fake_redis import FakeRedis
+
+
+def _tag_ids(client, tag: str) -> set[int]:
+    return {item["id"] for item in client.get("/search", params={"q": f"#{tag}"}).json()["items"]}
+
+
+def test_tag_search_any_and_all(client, make_user):
+    _, headers = make_user("tagger")
+    both = client.post("/posts", json={"text": "#red #blue"}, headers=headers).json()["id"]
+    red = client.post("/posts", json={"text": "#red only"}, headers=headers).json()["id"]
+    assert _tag_ids(client, "red") == {both, red}
+    found = client.get("/search", params={"q": "#red #blue", "tags_mode": "all"}).json()["items"]
+    assert [item["id"] for item in found] == [both]
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    # этот воркер и «соседний» — через общий фейковый Redis
+    monkeypatch.setattr(settings, "REALTIME_BACKEND", "redis")
+    server = FakeRedis()
+    broker, neighbour = RedisBroker(server), RedisBroker(server)
+    broker.add_listener(postings.on_event)
+    broker.start()
+    monkeypatch.setattr(realtime, "_broker", broker)
+    yield server, neighbour
+    broker.stop()
+
+
+def _wait(condition) -> bool:
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_eviction_from_another_worker(workers):
+    _, neighbour = workers
+    postings._postings.set(999, postings.Postings([], complete=True))
+    neighbour.publish("postings", {"type": "postings.evict", "hashtag_ids": [999]})
+    assert _wait(lambda: postings._postings.get(999) is None)
+
+
+def test_tag_change_is_broadcast(client, make_user, workers):
+    server, _ = workers
+    listener = server.pubsub()
+    listener.psubscribe("bl:rt:postings")
+    _, headers = make_user("broadcaster")
+    client.post("/posts", json={"text": "#green"}, headers=headers)
+    message = listener.get_message(timeout=5)
+    assert message is not None and b"postings.evict" in message["data"]
@@ -0,0 +1,75 @@
+import asyncio
+import gc
+import time
+import pytest
+from fastapi import WebSocketDisconnect
+from app import realtime
+from app.realtime import RedisBroker
+from app.routers.realtime import _task_done
+from fake_redis import FakeRedis
+
+
+@pytest.fixture
+def redis_broker(monkeypatch):
+    # брокер приложения — через общий фейковый Redis, как в нескольких воркерах
+    server = FakeRedis()
+    broker = RedisBroker(server)
+    broker.start()
+    monkeypatch.setattr(realtime, "_broker", broker)
+    yield server, broker
+    broker.stop()
+
+
+def test_event_from_another_worker_reaches_subscriber(redis_broker):
+    server, broker = redis_broker
+    other_worker = RedisBroker(server)
+
+    async def scenario():
+        sub = broker.subscribe(["author:7"])
+        other_worker.publish("author:7", {"type": "post", "post_id": 1})
+        other_worker.publish("author:8", {"type": "post", "post_id": 2})
+        try:
+            return await sub.get(5), await sub.get(0.3)
+        finally:
+            broker.unsubscribe(sub)
+
+    assert asyncio.run(scenario()) == ({"type": "post", "post_id": 1}, None)
+
+
+def test_published_post_reaches_follower_over_websocket(client, make_user, redis_broker):
+    author, author_headers = make_user("author")
+    _, follower_headers = make_user("follower")
+    assert client.post(f"/users/{author}/follow", headers=follower_headers).status_code == 204
+    with client.websocket_connect("/realtime/ws", headers=follower_headers) as ws:
+        post_id = client.post("/posts", json={"text": "pushed"}, headers=author_headers).json()["id"]
+        event = ws.receive_json()
+        while event["type"] == "ping":
+            event = ws.receive_json()
+        assert event["type"] == "post" and event["post_id"] == post_id
+    # отписка — на стороне сервера, после закрытия сокета
+    deadline = time.monotonic() + 5
+    while redis_broker[1].connections and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert redis_broker[1].connections == 0
+
+
+
+def test_websocket_task_exception_is_retrieved():
+    # иначе asyncio пишет «Task exception was never retrieved» на каждом отключении клиента
+    async def scenario(callback) -> list:
+        unhandled = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+
+        async def drain():
+            raise WebSocketDisconnect(1000)
+
+        task = asyncio.create_task(drain())
+        if callback:
+            task.add_done_callback(callback)
+        await asyncio.wait([task])
+        del task
+        gc.collect()
+        return unhandled
+
+    assert asyncio.run(scenario(None))
+    assert asyncio.run(scenario(_task_done)) == []
@@ -0,0 +1,92 @@
+import pytest
+from app import response_cache
+from app.response_cache import MemoryBackend, RedisBackend
+from fake_redis import FakeRedis
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch):
+    if request.param == "redis":
+        instance = RedisBackend(FakeRedis(), ttl=30)
+    else:
+        instance = MemoryBackend(maxsize=100, ttl=30)
+    monkeypatch.setattr(response_cache, "_backend", instance)
+    return instance
+
+
+def test_versions_are_stable_until_bump(backend):
+    first = backend.versions(["feed", "post:1"])
+    assert backend.versions(["feed", "post:1"]) == first
+    backend.bump(["feed"])
+    bumped = backend.versions(["feed", "post:1"])
+    assert bumped[0] != first[0] and bumped[1] == first[1]
+
+
+def test_redis_version_keys_expire():
+    redis = FakeRedis()
+    backend = RedisBackend(redis, ttl=30)
+    backend.bump(["feed"])
+    assert 0 < redis.ttl("bl:resp:ver:feed") <= 30 * response_cache.VERSION_TTL_FACTOR
+    backend.versions(["post:1"])
+    assert redis.ttl("bl:resp:ver:post:1") > 0
+
+
+def test_redis_expired_version_is_never_reused():
+    redis = FakeRedis()
+    backend = RedisBackend(redis, ttl=30)
+    seen = {backend.versions(["feed"])[0]}
+    for _ in range(3):
+        backend.bump(["feed"])
+        seen.add(backend.versions(["feed"])[0])
+    redis.delete("bl:resp:ver:feed")
+    assert backend.versions(["feed"])[0] not in seen
+
+
+def test_redis_version_lost_between_set_and_get():
+    # чужой SET NX выиграл, но ключ истёк раньше нашего GET — версия всё равно выдаётся
+    class Racing(FakeRedis):
+        def set(self, key, value, ex=None, nx=False):
+            if nx and key.endswith("ver:feed"):
+                return None
+            return super().set(key, value, ex=ex, nx=nx)
+
+    assert RedisBackend(Racing(), ttl=30).versions(["feed"])[0] > 0
+
+
+def _get(client, path, **headers):
+    return client.get(path, headers=headers)
+
+
+def test_miss_hit_and_not_modified(client, make_user, backend):
+    _, headers = make_user("cacher")
+    post_id = client.post("/posts", json={"text": "cached post"}, headers=headers).json()["id"]
+    path = f"/posts/{post_id}"
+    first = _get(client, path)
+    assert first.headers["x-cache"] == "MISS"
+    second = _get(client, path)
+    assert second.headers["x-cache"] == "HIT" and second.content == first.content
+    etag = first.headers["etag"]
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', "*"):
+        assert _get(client, path, **{"If-None-Match": if_none_match}).status_code == 304
+    assert _get(client, path, **{"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("mutation", ["like", "edit", "post"])
+def test_mutations_invalidate(client, make_user, backend, mutation):
+    _, headers = make_user("mutator")
+    post_id = client.post("/posts", json={"text": "before"}, headers=headers).json()["id"]
+    path = "/feed/public" if mutation == "post" else f"/posts/{post_id}"
+    _get(client, path)
+    assert _get(client, path).headers["x-cache"] == "HIT"
+    if mutation == "like":
+        assert client.post(f"/posts/{post_id}/like", headers=headers).status_code == 204
+    elif mutation == "edit":
+        assert client.patch(f"/posts/{post_id}", json={"text": "after"}, headers=headers).status_code == 200
+    else:
+        assert client.post("/posts", json={"text": "newer"}, headers=headers).status_code == 201
+    refreshed = _get(client, path)
+    assert refreshed.headers["x-cache"] == "MISS"
+    if mutation == "edit":
+        assert refreshed.json()["text"] == "after"
+    if mutation == "post":
+        assert refreshed.json()["items"][0]["text"] == "newer"
@@ -0,0 +1,30 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def posts(client, make_user):
+    _, headers = make_user("searcher")
+    for text in ("hello world #news", "another hello", "what's up?", "plain text"):
+        assert client.post("/posts", json={"text": text}, headers=headers).status_code == 201
+
+
+def _texts(client, q: str) -> set[str]:
+    response = client.get("/search", params={"q": q})
+    assert response.status_code == 200
+    return {item["text"] for item in response.json()["items"]}
+
+
+def test_words_and_tags(client, posts):
+    assert _texts(client, "hello") >= {"hello world #news", "another hello"}
+    assert "plain text" not in _texts(client, "hello")
+    assert "hello world #news" in _texts(client, "#news")
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("'", {"what's up?"}), ("?", {"what's up?"}), ("#", {"hello world #news"}), ("-", set()), ("   ", set()),
+])
+def test_punctuation_only_query_keeps_the_filter(client, posts, q, expected):
+    # без \w в запросе условие поиска не должно пропадать — иначе в ответе вся таблица постов
+    found = _texts(client, q)
+    assert expected <= found
+    assert all(q.strip() and q.strip() in text for text in found)
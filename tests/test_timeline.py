@@ -0,0 +1,32 @@
+from app.config import settings
+
+
+def _feed(client, headers, limit=20) -> list[str]:
+    response = client.get("/feed/following", params={"limit": limit}, headers=headers)
+    assert response.status_code == 200
+    return [item["text"] for item in response.json()["items"]]
+
+
+def test_post_of_heavy_author_survives_dropping_below_threshold(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "TIMELINE_FANOUT_MAX_FOLLOWERS", 2)
+    heavy, heavy_headers = make_user("heavy")
+    light, light_headers = make_user("light")
+    _, reader = make_user("reader")
+    _, other = make_user("other")
+    for headers in (reader, other):
+        assert client.post(f"/users/{heavy}/follow", headers=headers).status_code == 204
+    assert client.post(f"/users/{light}/follow", headers=reader).status_code == 204
+
+    # старый и новый пост «лёгкого» автора лежат в ленте, пост «тяжёлого» между ними — нет
+    client.post("/posts", json={"text": "light older"}, headers=light_headers)
+    client.post("/posts", json={"text": "heavy post"}, headers=heavy_headers)
+    client.post("/posts", json={"text": "light newer"}, headers=light_headers)
+    assert _feed(client, reader, limit=3) == ["light newer", "heavy post", "light older"]
+
+    # автор опустился ниже порога: пост, не разложенный по лентам, всё равно подмешивается
+    assert client.post(f"/users/{heavy}/unfollow", headers=other).status_code == 204
+    assert _feed(client, reader, limit=3) == ["light newer", "heavy post", "light older"]
+
+    # новые посты снова раскладываются
+    client.post("/posts", json={"text": "heavy again"}, headers=heavy_headers)
+    assert _feed(client, reader, limit=4) == ["heavy again", "light newer", "heavy post", "light older"]